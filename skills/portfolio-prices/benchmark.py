@@ -0,0 +1,12 @@
+#!/usr/bin/env python3
+"""
+Benchmark fetch_all_prices offline.
+
+Thin command-line wrapper around pricing.bench.
+"""
+
+from pricing.bench import main
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Replay transactions.json into per-asset positions.
+
+The ledger is flattened into column arrays (asset, date, quantity, amount) and
+replayed in one vectorized pass using the average-cost method: buys add their
+gross amount to the position cost, sells remove cost pro rata and book the
+difference to their proceeds as realized P&L. Results are kept per asset with
+a digest of its transactions, so after an edit only the changed assets are
+replayed again.
+
+Usage:
+    python ledger.py [--check] [--json] [--full] [--verify]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+TRANSACTIONS_PATH = os.path.expanduser("~/vault/projects/Fin/transactions.json")
+PORTFOLIO_PATH = os.path.expanduser("~/vault/projects/Fin/portfolio.json")
+CURRENT_PRICES_PATH = os.path.expanduser("~/vault/projects/Fin/current_prices.json")
+STATE_PATH = os.path.expanduser("~/.cache/portfolio-prices/ledger_state.json")
+
+# transactions.json names some assets differently from portfolio.json
+TICKER_ALIASES = {
+    "BITCOIN": "BTC",
+    "ETHEREUM": "ETH",
+    "AVALANCHE": "AVAX",
+}
+
+# Crypto records are kept in USD
+CURRENCY_ALIASES = {
+    "Crypto": "USD",
+}
+
+QUANTITY_TOLERANCE = 1e-6
+# Smallest running product of sell fractions before the cost sum is rescaled
+MIN_SCALE = 1e-6
+
+
+def record_key(category: str, record: Dict) -> str:
+    return f"{category}/{record.get('ticker') or record.get('asset')}"
+
+
+def record_currency(record: Dict) -> str:
+    currency = record.get('currency') or "BRL"
+    return CURRENCY_ALIASES.get(currency, currency)
+
+
+def to_currency(amount: float, source: str, target: str, usd_brl_rate: float) -> float:
+    """Convert between BRL and USD at `usd_brl_rate`."""
+    source = CURRENCY_ALIASES.get(source, source)
+    if source == target:
+        return amount
+    if source == "BRL" and target == "USD":
+        return amount / usd_brl_rate
+    if source == "USD" and target == "BRL":
+        return amount * usd_brl_rate
+    raise ValueError(f"Unsupported currency conversion: {source} -> {target}")
+
+
+def record_digest(record: Dict, usd_brl_rate: float) -> str:
+    """Fingerprint of everything the replay of one asset depends on."""
+    currency = record_currency(record)
+    transactions = record.get('transactions', [])
+    payload = {
+        "currency": currency,
+        "current_quantity": record.get('current_quantity'),
+        "transactions": transactions,
+    }
+    # Amounts in another currency are converted, so the rate matters too
+    if any(CURRENCY_ALIASES.get(t.get('currency', currency), t.get('currency', currency)) != currency
+           for t in transactions):
+        payload["usd_brl_rate"] = usd_brl_rate
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def build_columns(records: List[Tuple[str, Dict]], usd_brl_rate: float) -> Dict[str, np.ndarray]:
+    """Flatten asset records into column arrays sorted by (asset, date, ledger order)."""
+    asset, date, quantity, amount = [], [], [], []
+    for index, (_, record) in enumerate(records):
+        currency = record_currency(record)
+        for t in record.get('transactions', []):
+            gross = float(t['gross_amount'])
+            net = t.get('net_amount')
+            # Sells book their net proceeds when known; a zero net is a missing value
+            value = float(net) if (t['quantity'] < 0 and net) else gross
+            asset.append(index)
+            date.append(t['date'])
+            quantity.append(float(t['quantity']))
+            amount.append(to_currency(value, t.get('currency', currency), currency, usd_brl_rate))
+
+    columns = {
+        "asset": np.array(asset, dtype=np.int64),
+        "date": np.array(date, dtype="datetime64[D]"),
+        "quantity": np.array(quantity, dtype=np.float64),
+        "amount": np.array(amount, dtype=np.float64),
+    }
+    order = np.lexsort((np.arange(len(asset)), columns["date"], columns["asset"]))
+    return {name: column[order] for name, column in columns.items()}
+
+
+def _run_cost(factor: np.ndarray, bought: np.ndarray) -> np.ndarray:
+    """
+    Solve C_k = f_k * C_(k-1) + b_k for one asset's transactions.
+
+    Between rescales C_k = s_k * (C + sum(b_j / s_j)) with s the running
+    product of f, carried in from the previous chunk. A chunk ends as soon as
+    s drops below MIN_SCALE, so b / s never grows large enough to swamp the
+    sum; a full close (f = 0) always ends one.
+    """
+    cost = np.empty(len(factor))
+    carry = 0.0
+    start = 0
+    while start < len(factor):
+        scale = np.multiply.accumulate(factor[start:])
+        small = np.flatnonzero(scale < MIN_SCALE)
+        if len(small) and small[0] == 0:
+            # A full close or a steep sell: step once and rescale from there
+            cost[start] = carry = factor[start] * carry + bought[start]
+            start += 1
+            continue
+        stop = start + (small[0] if len(small) else len(scale))
+        scale = scale[:stop - start]
+        cost[start:stop] = scale * (carry + np.cumsum(bought[start:stop] / scale))
+        carry = cost[stop - 1]
+        start = stop
+    return cost
+
+
+def replay(columns: Dict[str, np.ndarray], n_assets: int) -> Dict[str, np.ndarray]:
+    """
+    Replay sorted ledger columns and return per-asset arrays.
+
+    Average cost follows C_k = f_k * C_(k-1) + b_k, where b_k is a buy's amount
+    and f_k the fraction of the position a sell leaves. Each asset is solved on
+    its own slice with cumulative products and sums; a full close (a sell
+    leaving no more than QUANTITY_TOLERANCE) or a sell with no known position,
+    which happens when the ledger starts mid-history, sets f_k to zero.
+    """
+    asset = columns["asset"]
+    quantity = columns["quantity"]
+    amount = columns["amount"]
+    n = len(asset)
+
+    result = {
+        "quantity": np.zeros(n_assets),
+        "cost": np.zeros(n_assets),
+        "realized": np.zeros(n_assets),
+        "transactions": np.bincount(asset, minlength=n_assets) if n else np.zeros(n_assets, dtype=np.int64),
+    }
+    if not n:
+        return result
+
+    first = np.flatnonzero(np.r_[True, asset[1:] != asset[:-1]])
+    for start, stop in zip(first, np.r_[first[1:], n]):
+        q = quantity[start:stop]
+        paid = amount[start:stop]
+        held = np.cumsum(q)
+        held_before = held - q
+
+        sell = q < 0
+        closed = sell & ((held_before <= 0) | (np.abs(held) <= QUANTITY_TOLERANCE))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            kept = np.clip(held / held_before, 0.0, 1.0)
+        factor = np.where(closed, 0.0, np.where(sell, kept, 1.0))
+        cost = _run_cost(factor, np.where(sell, 0.0, paid))
+
+        cost_before = np.r_[0.0, cost[:-1]]
+        realized = np.where(sell, paid - (cost_before - cost), 0.0)
+
+        index = asset[start]
+        result["quantity"][index] = held[-1]
+        result["cost"][index] = cost[-1]
+        result["realized"][index] = realized.sum()
+    return result
+
+
+def replay_naive(columns: Dict[str, np.ndarray], n_assets: int) -> Dict[str, np.ndarray]:
+    """Transaction-by-transaction replay, kept as the reference for `replay`."""
+    result = {
+        "quantity": np.zeros(n_assets),
+        "cost": np.zeros(n_assets),
+        "realized": np.zeros(n_assets),
+        "transactions": np.bincount(columns["asset"], minlength=n_assets),
+    }
+    for index, quantity, amount in zip(columns["asset"], columns["quantity"], columns["amount"]):
+        held = result["quantity"][index]
+        cost = result["cost"][index]
+        if quantity >= 0:
+            cost += amount
+        elif held <= 0 or abs(held + quantity) <= QUANTITY_TOLERANCE:
+            result["realized"][index] += amount - cost
+            cost = 0.0
+        else:
+            remaining = cost * min(max((held + quantity) / held, 0.0), 1.0)
+            result["realized"][index] += amount - (cost - remaining)
+            cost = remaining
+        result["quantity"][index] = held + quantity
+        result["cost"][index] = cost
+    return result
+
+
+def verify_replay(columns: Dict[str, np.ndarray], n_assets: int) -> List[int]:
+    """Indices of assets where `replay` and `replay_naive` disagree by more than a cent."""
+    fast = replay(columns, n_assets)
+    slow = replay_naive(columns, n_assets)
+    wrong = np.zeros(n_assets, dtype=bool)
+    for name, tolerance in (("quantity", QUANTITY_TOLERANCE), ("cost", 0.01), ("realized", 0.01)):
+        wrong |= ~np.isclose(fast[name], slow[name], rtol=1e-9, atol=tolerance)
+    return np.flatnonzero(wrong).tolist()
+
+
+class LedgerEngine:
+    """Per-asset ledger results, replaying only assets whose transactions changed."""
+
+    def __init__(self, state_path: Optional[str] = STATE_PATH):
+        self.state_path = state_path
+        self.positions: Dict[str, Dict] = {}
+        self.replayed = 0
+        if state_path and os.path.exists(state_path):
+            with open(state_path) as f:
+                self.positions = json.load(f)
+
+    def update(self, ledger: Dict, usd_brl_rate: float) -> Dict[str, Dict]:
+        """Bring positions up to date with `ledger` (the parsed transactions.json)."""
+        records = [(record_key(category, record), record)
+                   for category, items in ledger['portfolio'].items()
+                   for record in items]
+        digests = {key: record_digest(record, usd_brl_rate) for key, record in records}
+
+        changed = [(key, record) for key, record in records
+                   if self.positions.get(key, {}).get('digest') != digests[key]]
+        self.replayed = len(changed)
+
+        if changed:
+            result = replay(build_columns(changed, usd_brl_rate), len(changed))
+            for index, (key, record) in enumerate(changed):
+                category, _ = key.split("/", 1)
+                quantity = float(result["quantity"][index])
+                cost = float(result["cost"][index])
+                self.positions[key] = {
+                    "digest": digests[key],
+                    "category": category,
+                    "ticker": record.get('ticker') or record.get('asset'),
+                    "currency": record_currency(record),
+                    "transactions": int(result["transactions"][index]),
+                    "quantity": round(quantity, 8),
+                    "cost_basis": round(cost, 2),
+                    "avg_cost": round(cost / quantity, 4) if quantity > QUANTITY_TOLERANCE else None,
+                    "realized_pnl": round(float(result["realized"][index]), 2),
+                    "recorded_quantity": record.get('current_quantity'),
+                }
+
+        for key in set(self.positions) - set(digests):
+            del self.positions[key]
+        for position in self.positions.values():
+            position["cost_basis_brl"] = round(
+                to_currency(position["cost_basis"], position["currency"], "BRL", usd_brl_rate), 2)
+            position["cost_basis_usd"] = round(
+                to_currency(position["cost_basis"], position["currency"], "USD", usd_brl_rate), 2)
+        return self.positions
+
+    def save(self) -> None:
+        if not self.state_path:
+            return
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        with open(self.state_path, 'w') as f:
+            json.dump(self.positions, f)
+
+
+def check_against_portfolio(positions: Dict[str, Dict], portfolio: Dict) -> List[str]:
+    """Describe every disagreement between the replayed ledger and portfolio.json."""
+    issues = []
+    holdings = {h['ticker']: h for h in portfolio['holdings']}
+    seen = set()
+    for position in positions.values():
+        ticker = TICKER_ALIASES.get(position["ticker"], position["ticker"])
+        seen.add(ticker)
+        holding = holdings.get(ticker)
+        if holding is None:
+            if abs(position["quantity"]) > QUANTITY_TOLERANCE:
+                issues.append(f"{ticker}: ledger holds {position['quantity']:g} but it is not in portfolio.json")
+            continue
+        if abs(position["quantity"] - holding['quantity']) > QUANTITY_TOLERANCE:
+            issues.append(f"{ticker}: ledger {position['quantity']:g} != portfolio.json {holding['quantity']:g}")
+        recorded = position.get("recorded_quantity")
+        if recorded is not None and abs(position["quantity"] - recorded) > QUANTITY_TOLERANCE:
+            issues.append(f"{ticker}: ledger {position['quantity']:g} != current_quantity {recorded:g}")
+        cost_basis = holding.get('costBasis')
+        if cost_basis is not None and abs(position["cost_basis_brl"] - cost_basis) > 0.01:
+            issues.append(f"{ticker}: ledger cost basis {position['cost_basis_brl']:.2f} BRL"
+                          f" != costBasis {cost_basis:.2f}")
+    for ticker in holdings.keys() - seen:
+        issues.append(f"{ticker}: in portfolio.json but has no ledger record")
+    return issues
+
+
+def load_usd_brl_rate(path: str = CURRENT_PRICES_PATH) -> float:
+    """Latest USD/BRL rate from the last pricing run."""
+    with open(path) as f:
+        return json.load(f)['usd_brl_rate']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay transactions.json into per-asset positions")
+    parser.add_argument("--transactions", default=TRANSACTIONS_PATH, help="Path to transactions.json")
+    parser.add_argument("--portfolio", default=PORTFOLIO_PATH, help="Path to portfolio.json")
+    parser.add_argument("--usd-brl", type=float, help="USD/BRL rate (default: from current_prices.json)")
+    parser.add_argument("--check", action="store_true", help="Compare quantities against portfolio.json")
+    parser.add_argument("--json", action="store_true", help="Print positions as JSON")
+    parser.add_argument("--full", action="store_true", help="Ignore saved state and replay every asset")
+    parser.add_argument("--verify", action="store_true",
+                        help="Compare the vectorized replay with a transaction-by-transaction one")
+    args = parser.parse_args()
+
+    with open(args.transactions) as f:
+        ledger = json.load(f)
+    usd_brl_rate = args.usd_brl or load_usd_brl_rate()
+
+    engine = LedgerEngine()
+    if args.full:
+        engine.positions = {}
+    positions = engine.update(ledger, usd_brl_rate)
+    engine.save()
+
+    if args.json:
+        print(json.dumps(positions, indent=2))
+    else:
+        print(f"Replayed {engine.replayed}/{len(positions)} assets (USD/BRL {usd_brl_rate:.4f})")
+        print(f"{'Asset':<30} {'Qty':>14} {'Avg cost':>12} {'Cost basis':>14} {'Realized':>12}")
+        for position in positions.values():
+            if abs(position["quantity"]) <= QUANTITY_TOLERANCE and not position["realized_pnl"]:
+                continue
+            avg = f"{position['avg_cost']:.2f}" if position["avg_cost"] is not None else "-"
+            print(f"{position['ticker']:<30} {position['quantity']:>14g} {avg:>12}"
+                  f" {position['cost_basis']:>10,.2f} {position['currency']:<3}"
+                  f" {position['realized_pnl']:>12,.2f}")
+
+    if args.verify:
+        records = [(record_key(category, record), record)
+                   for category, items in ledger['portfolio'].items()
+                   for record in items]
+        wrong = verify_replay(build_columns(records, usd_brl_rate), len(records))
+        print(f"\n{len(wrong)} assets where the vectorized replay disagrees with the reference")
+        for index in wrong:
+            print(f"  {records[index][0]}")
+        if wrong:
+            return 1
+
+    if args.check:
+        with open(args.portfolio) as f:
+            portfolio = json.load(f)
+        issues = check_against_portfolio(positions, portfolio)
+        print(f"\n{len(issues)} mismatches against {args.portfolio}")
+        for issue in issues:
+            print(f"  {issue}")
+        return 1 if issues else 0
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,12 @@
+#!/usr/bin/env python3
+"""
+Show portfolio movers from the price history.
+
+Thin command-line wrapper around pricing.history.
+"""
+
+from pricing.history import main
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,45 @@
+"""
+Portfolio pricing library.
+
+Shared by the portfolio-prices skill (fetch_prices.py) and the portfolio
+manager skill (update_prices.py). Providers fetch prices from one source each,
+the resolver routes holdings to providers, and the engine values a
+portfolio.json through them with caching and bounded concurrency.
+"""
+
+from .cache import PriceCache
+from .engine import OUTPUT_PATH, PORTFOLIO_PATH, fetch_all_prices, fetch_portfolios
+from .fx import FxMatrix
+from .history import PriceHistory
+from .limits import ProviderLimit, TokenBucket
+from .providers import (
+    CostBasisProvider,
+    PriceProvider,
+    StubProvider,
+    TesouroProvider,
+    YahooProvider,
+)
+from .report import build_report
+from .resolver import Resolver, default_resolver
+from .watch import PriceWatcher
+
+__all__ = [
+    "OUTPUT_PATH",
+    "PORTFOLIO_PATH",
+    "CostBasisProvider",
+    "FxMatrix",
+    "PriceCache",
+    "PriceHistory",
+    "PriceProvider",
+    "PriceWatcher",
+    "ProviderLimit",
+    "Resolver",
+    "StubProvider",
+    "TesouroProvider",
+    "TokenBucket",
+    "YahooProvider",
+    "build_report",
+    "default_resolver",
+    "fetch_all_prices",
+    "fetch_portfolios",
+]
@@ -0,0 +1,311 @@
+"""
+Offline benchmark for the pricing pipeline.
+
+fetch_all_prices runs against stand-ins for yfinance and the Tesouro API, so
+timings do not depend on the network and every run sees the same data. Yahoo
+is replaced in-process. The Tesouro /bonds endpoint is a local HTTP server that
+answers ETag revalidation with a 304 like the real one. Both stand-ins sleep
+for a configurable latency per request.
+
+Each scenario is one synthetic portfolio size, priced cold (no cache) or warm
+(cache primed by an earlier run). Results are appended to a JSON-lines file and
+compared with the previous run of the same scenario and latency settings.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import tempfile
+import threading
+import time
+import tracemalloc
+import zlib
+from collections import Counter
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional
+
+import pandas as pd
+
+from . import providers
+from .cache import PriceCache
+from .engine import fetch_all_prices
+
+BENCH_PATH = os.path.expanduser("~/.cache/portfolio-prices/bench.jsonl")
+SIZES = (44, 500, 5000)
+MODES = ("cold", "warm")
+
+# (type, localCurrency, ticker prefix, weight): the mix of the real portfolio
+MIX = [
+    ("Stocks", "USD", "U", 16),
+    ("Stocks", "BRL", "B", 11),
+    ("Fixed Income", "BRL", None, 5),
+    ("FII", "BRL", "F", 4),
+    ("Crypto", "USD", "C", 3),
+    ("Fixed Income", "USD", "T", 2),
+    ("REITS", "USD", "R", 2),
+    ("Gold", "USD", "G", 1),
+]
+PATTERN = [entry for entry in MIX for _ in range(entry[3])]
+
+BOND_INDEXES = ["IPCA+", "IPCA+ c/ Juros", "Selic", "Prefixado", "Educa+"]
+BOND_NAMES = [f"Tesouro {index} {year}" for year in range(2026, 2066) for index in BOND_INDEXES]
+
+FX_RATES = {"BRL": 5.2, "CHF": 0.88, "EUR": 0.92, "SGD": 1.34, "TWD": 32.1}
+
+
+def synthetic_price(symbol: str) -> float:
+    """Stable pseudo-random price for `symbol`."""
+    return 1.0 + zlib.crc32(symbol.encode()) % 100000 / 100
+
+
+def synthetic_portfolio(size: int, bond_names: List[str] = BOND_NAMES) -> Dict:
+    """portfolio.json with `size` holdings in the same type mix as the real one."""
+    holdings = []
+    for i in range(size):
+        asset_type, currency, prefix, _ = PATTERN[i % len(PATTERN)]
+        ticker = bond_names[i % len(bond_names)] if prefix is None else f"{prefix}{i:05d}"
+        holding = {
+            "asset": ticker,
+            "ticker": ticker,
+            "quantity": 1 + i % 7,
+            "localCurrency": currency,
+            "type": asset_type,
+        }
+        if prefix is None:
+            holding["costBasis"] = 1000.0 * holding["quantity"]
+        holdings.append(holding)
+    return {"holdings": holdings}
+
+
+def bonds_payload(names: List[str] = BOND_NAMES) -> Dict:
+    """Tesouro /bonds response listing `names` under their API spelling."""
+    return {"bonds": [
+        {"name": name.replace("c/ Juros", "com Juros Semestrais"),
+         "unitary_redemption_value": synthetic_price(name)}
+        for name in names
+    ]}
+
+
+class YahooStandIn:
+    """Replacement for the yfinance module: download() and Ticker().history()."""
+
+    def __init__(self, latency: float = 0.0, miss_rate: float = 0.0):
+        self.latency = latency
+        # Fraction of symbols left out of bulk downloads, to exercise the per-symbol fallback
+        self.miss_rate = miss_rate
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def _count(self, kind: str):
+        with self._lock:
+            self.calls[kind] += 1
+        time.sleep(self.latency)
+
+    def quote(self, symbol: str) -> float:
+        if symbol.endswith("=X"):
+            return FX_RATES.get(symbol[:-2].replace("USD", "", 1), synthetic_price(symbol))
+        return synthetic_price(symbol)
+
+    def download(self, tickers, period="1d", progress=False, threads=True, timeout=10) -> pd.DataFrame:
+        self._count("download")
+        tickers = list(tickers)
+        served = [t for t in tickers if zlib.crc32(t.encode()) % 1000 >= self.miss_rate * 1000]
+        columns = pd.MultiIndex.from_product([["Close"], tickers], names=["Price", "Ticker"])
+        row = [self.quote(t) if t in served else float("nan") for t in tickers]
+        return pd.DataFrame([row], index=pd.to_datetime([datetime.now().date()]), columns=columns)
+
+    def Ticker(self, symbol: str) -> "_TickerStandIn":
+        return _TickerStandIn(self, symbol)
+
+
+class _TickerStandIn:
+    def __init__(self, yahoo: YahooStandIn, symbol: str):
+        self.yahoo = yahoo
+        self.symbol = symbol
+
+    def history(self, period="1d", timeout=10) -> pd.DataFrame:
+        self.yahoo._count("history")
+        return pd.DataFrame({"Close": [self.yahoo.quote(self.symbol)]})
+
+
+class TesouroStandIn:
+    """Local HTTP server standing in for the Tesouro /bonds endpoint."""
+
+    def __init__(self, payload: Dict, latency: float = 0.0):
+        body = json.dumps(payload).encode()
+        etag = f'"{zlib.crc32(body):08x}"'
+        calls = self.calls = Counter()
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                time.sleep(latency)
+                if self.headers.get("If-None-Match") == etag:
+                    calls[304] += 1
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                calls[200] += 1
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/bonds"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@contextlib.contextmanager
+def standins(yahoo: YahooStandIn, tesouro: TesouroStandIn, snapshot_path: str) -> Iterator[None]:
+    """Point the providers at the stand-ins for the duration of the block."""
+    saved = providers.yf, providers.TESOURO_URL, providers.TESOURO_SNAPSHOT_PATH
+    providers.yf, providers.TESOURO_URL, providers.TESOURO_SNAPSHOT_PATH = yahoo, tesouro.url, snapshot_path
+    try:
+        yield
+    finally:
+        providers.yf, providers.TESOURO_URL, providers.TESOURO_SNAPSHOT_PATH = saved
+
+
+def run_scenario(size: int, mode: str, latency: float, tesouro_latency: float, miss_rate: float,
+                 payload: Optional[Dict] = None, trace: bool = False) -> Dict:
+    """Price a synthetic portfolio once in a scratch directory and measure the run."""
+    payload = payload or bonds_payload()
+    bonds = payload.get("bonds", payload) if isinstance(payload, dict) else payload
+    names = [bond.get("name") or bond.get("bond_name") for bond in bonds]
+    with tempfile.TemporaryDirectory() as tmp:
+        portfolio_path = os.path.join(tmp, "portfolio.json")
+        with open(portfolio_path, "w") as f:
+            json.dump(synthetic_portfolio(size, names), f)
+        yahoo = YahooStandIn(latency, miss_rate)
+        tesouro = TesouroStandIn(payload, tesouro_latency)
+        cache = PriceCache(os.path.join(tmp, "prices.db")) if mode == "warm" else None
+        try:
+            with standins(yahoo, tesouro, os.path.join(tmp, "tesouro_bonds.json")), \
+                    contextlib.redirect_stdout(io.StringIO()):
+                if cache:
+                    fetch_all_prices(portfolio_path, cache=cache)
+                    yahoo.calls.clear()
+                    tesouro.calls.clear()
+                    cache.hits = cache.misses = 0
+                if trace:
+                    tracemalloc.start()
+                start = time.perf_counter()
+                prices = fetch_all_prices(portfolio_path, cache=cache)
+                wall = time.perf_counter() - start
+                peak = tracemalloc.get_traced_memory()[1] if trace else None
+                if trace:
+                    tracemalloc.stop()
+        finally:
+            tesouro.close()
+            if cache:
+                cache.close()
+
+    return {
+        "holdings": size,
+        "priced": sum(1 for h in prices['holdings'] if h['value_usd']),
+        "wall_s": round(wall, 4),
+        "peak_mib": round(peak / 2**20, 2) if peak is not None else None,
+        "yahoo_downloads": yahoo.calls["download"],
+        "yahoo_singles": yahoo.calls["history"],
+        "tesouro_requests": sum(tesouro.calls.values()),
+        "tesouro_not_modified": tesouro.calls[304],
+        "cache_hits": cache.hits if cache else None,
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def load_results(path: str) -> List[Dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def previous_result(results: List[Dict], record: Dict) -> Optional[Dict]:
+    """Latest stored result with the same scenario and latency settings."""
+    keys = ("scenario", "latency_ms", "tesouro_latency_ms", "miss_rate")
+    for result in reversed(results):
+        if all(result.get(key) == record[key] for key in keys):
+            return result
+    return None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the pricing pipeline against offline stand-ins")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="Portfolio sizes to run")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=MODES,
+                        help="cold: no cache; warm: cache primed by a previous run")
+    parser.add_argument("--latency", type=float, default=250, help="Yahoo latency per request, ms")
+    parser.add_argument("--tesouro-latency", type=float, default=400, help="Tesouro API latency per request, ms")
+    parser.add_argument("--miss-rate", type=float, default=0.0,
+                        help="Fraction of symbols missing from bulk downloads (forces per-symbol fallback)")
+    parser.add_argument("--tesouro-payload", metavar="PATH",
+                        help="Serve this recorded /bonds response instead of the synthetic one")
+    parser.add_argument("--results", default=BENCH_PATH, help="JSON-lines file results are appended to")
+    parser.add_argument("--label", help="Free-form note stored with the results")
+    parser.add_argument("--no-save", action="store_true", help="Print results without storing them")
+    args = parser.parse_args(argv)
+
+    payload = None
+    if args.tesouro_payload:
+        with open(args.tesouro_payload) as f:
+            payload = json.load(f)
+
+    history = load_results(args.results)
+    commit = git_commit()
+    records = []
+
+    print(f"{'scenario':<12} {'wall s':>8} {'Δ prev':>8} {'peak MiB':>9} {'yf dl':>6} {'yf 1x':>6} "
+          f"{'tesouro':>8} {'priced':>11}")
+    for size in args.sizes:
+        for mode in args.modes:
+            settings = (size, mode, args.latency / 1000, args.tesouro_latency / 1000, args.miss_rate, payload)
+            result = run_scenario(*settings)
+            # Memory is measured on a separate run since tracing slows everything down
+            result["peak_mib"] = run_scenario(*settings, trace=True)["peak_mib"]
+            record = {
+                "timestamp": datetime.now().isoformat(timespec="seconds"),
+                "commit": commit,
+                "label": args.label,
+                "scenario": f"{size}-{mode}",
+                "latency_ms": args.latency,
+                "tesouro_latency_ms": args.tesouro_latency,
+                "miss_rate": args.miss_rate,
+                **result,
+            }
+            records.append(record)
+
+            previous = previous_result(history, record)
+            delta = f"{(record['wall_s'] / previous['wall_s'] - 1) * 100:+.0f}%" if previous else "-"
+            print(f"{record['scenario']:<12} {record['wall_s']:>8.3f} {delta:>8} {record['peak_mib']:>9.2f} "
+                  f"{record['yahoo_downloads']:>6} {record['yahoo_singles']:>6} {record['tesouro_requests']:>8} "
+                  f"{record['priced']:>5}/{record['holdings']:<5}")
+
+    if not args.no_save:
+        os.makedirs(os.path.dirname(args.results) or ".", exist_ok=True)
+        with open(args.results, "a") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+        print(f"\nResults appended to {args.results}")
+    return 0
@@ -0,0 +1,121 @@
+"""
+On-disk price cache for the pricing engine.
+
+Prices are stored in SQLite keyed by (provider, symbol) together with the time
+they were fetched. Whether a cached price can be reused depends on the asset
+class: crypto and FX go stale within minutes, exchange-listed assets stay fresh
+from the session close until the next session opens (holidays included, see
+markets.py), and Tesouro bonds reprice once a day.
+"""
+
+import os
+import sqlite3
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from .markets import is_session_open, last_session_close
+
+CACHE_PATH = os.path.expanduser("~/.cache/portfolio-prices/prices.db")
+
+CRYPTO_TTL = 5 * 60
+FX_TTL = 15 * 60
+SESSION_TTL = 15 * 60
+# Yahoo publishes the official close some minutes after the bell
+CLOSE_SETTLE = 30 * 60
+
+TESOURO_TZ = ZoneInfo("America/Sao_Paulo")
+
+
+def is_fresh(provider: str, asset_type: str, local_currency: str, fetched_at: float,
+             now: Optional[float] = None, max_age: Optional[float] = None) -> bool:
+    """Decide whether a price fetched at `fetched_at` can still be used."""
+    now = time.time() if now is None else now
+    age = now - fetched_at
+    if max_age is not None:
+        return age <= max_age
+    if provider == "tesouro":
+        return (datetime.fromtimestamp(fetched_at, TESOURO_TZ).date()
+                == datetime.fromtimestamp(now, TESOURO_TZ).date())
+    if asset_type == "Crypto":
+        return age <= CRYPTO_TTL
+    if asset_type == "FX":
+        return age <= FX_TTL
+    if is_session_open(local_currency, now):
+        return age <= SESSION_TTL
+    last_close = last_session_close(local_currency, now)
+    if now < last_close + CLOSE_SETTLE:
+        return age <= SESSION_TTL
+    return fetched_at >= last_close + CLOSE_SETTLE
+
+
+class PriceCache:
+    """SQLite-backed price store that counts hits and misses per run."""
+
+    def __init__(self, path: str = CACHE_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        # Age in seconds of every price served from the cache, by (provider, symbol)
+        self.ages: Dict[Tuple[str, str], float] = {}
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS prices ("
+            " provider TEXT NOT NULL,"
+            " symbol TEXT NOT NULL,"
+            " price REAL NOT NULL,"
+            " fetched_at REAL NOT NULL,"
+            " PRIMARY KEY (provider, symbol))"
+        )
+
+    def lookup(self, provider: str, classes: Dict[str, Tuple[str, str]],
+               max_age: Optional[float] = None, now: Optional[float] = None) -> Dict[str, float]:
+        """
+        Return cached prices that are still fresh.
+
+        `classes` maps each wanted symbol to its (asset_type, local_currency),
+        which selects the freshness policy. Every symbol counts as a hit or a miss.
+        """
+        symbols = list(classes)
+        if not symbols:
+            return {}
+        now = time.time() if now is None else now
+        placeholders = ",".join("?" * len(symbols))
+        rows = self._conn.execute(
+            f"SELECT symbol, price, fetched_at FROM prices WHERE provider = ? AND symbol IN ({placeholders})",
+            [provider, *symbols],
+        )
+        fresh = {}
+        for symbol, price, fetched_at in rows:
+            asset_type, local_currency = classes[symbol]
+            if is_fresh(provider, asset_type, local_currency, fetched_at, now, max_age):
+                fresh[symbol] = price
+                self.ages[(provider, symbol)] = now - fetched_at
+        self.hits += len(fresh)
+        self.misses += len(symbols) - len(fresh)
+        return fresh
+
+    def last_known(self, provider: str, symbols: List[str]) -> Dict[str, Tuple[float, float]]:
+        """Latest cached (price, fetched_at) of each symbol, however old; not counted as hits or misses."""
+        if not symbols:
+            return {}
+        placeholders = ",".join("?" * len(symbols))
+        rows = self._conn.execute(
+            f"SELECT symbol, price, fetched_at FROM prices WHERE provider = ? AND symbol IN ({placeholders})",
+            [provider, *symbols],
+        )
+        return {symbol: (price, fetched_at) for symbol, price, fetched_at in rows}
+
+    def put(self, provider: str, prices: Dict[str, float], fetched_at: Optional[float] = None) -> None:
+        """Store freshly fetched prices, replacing older entries."""
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO prices (provider, symbol, price, fetched_at) VALUES (?, ?, ?, ?)",
+                [(provider, symbol, price, fetched_at) for symbol, price in prices.items() if price],
+            )
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,138 @@
+"""Command-line entry point shared by fetch_prices.py and update_prices.py."""
+
+import argparse
+import json
+import os
+from typing import Dict, List, Optional, Sequence
+
+from . import metrics
+from .cache import PriceCache
+from .engine import OUTPUT_PATH, PORTFOLIO_PATH, RUN_DEADLINE, fetch_all_prices, fetch_portfolios
+from .history import PriceHistory
+from .report import build_report
+from .watch import EMIT_THRESHOLD, PriceWatcher
+
+
+def batch_outputs(portfolio_paths: Sequence[str], output_dir: Optional[str] = None) -> List[str]:
+    """Output path per portfolio: <name>.prices.json next to it, or in `output_dir`."""
+    outputs = []
+    for path in portfolio_paths:
+        name = os.path.splitext(os.path.basename(path))[0] + ".prices.json"
+        outputs.append(os.path.join(output_dir or os.path.dirname(os.path.abspath(path)), name))
+    if len(set(outputs)) < len(outputs):
+        raise ValueError("Two portfolios would write the same output file; rename one or drop --output-dir")
+    return outputs
+
+
+def print_totals(prices: Dict, currencies: Sequence[str]) -> None:
+    total_usd = sum(h['value_usd'] for h in prices['holdings'] if h['value_usd'])
+    fetched = sum(1 for h in prices['holdings'] if h['value_usd'])
+    print(f"Assets priced: {fetched}/{len(prices['holdings'])}")
+    stale = sum(1 for h in prices['holdings'] if h.get('stale')) + len(prices.get('stale_rates', {}))
+    if stale:
+        print(f"⚠️  Last known prices used for {stale} holdings/rates ('stale' and 'price_age' in the output)")
+    print(f"Total portfolio value: ${total_usd:,.2f} USD")
+    for currency in currencies:
+        key = f"value_{currency.lower()}"
+        total = sum(h.get(key) or 0 for h in prices['holdings']) if currency != "USD" else total_usd
+        print(f"Total portfolio value: {total:,.2f} {currency}")
+
+
+def main(argv: Optional[List[str]] = None, portfolio_path: str = PORTFOLIO_PATH,
+         output_path: str = OUTPUT_PATH, history: bool = True) -> int:
+    parser = argparse.ArgumentParser(description="Fetch current prices for portfolio holdings")
+    parser.add_argument("--portfolio", default=portfolio_path, help="Path to portfolio.json")
+    parser.add_argument("--output", default=output_path, help="Where to write current_prices.json")
+    parser.add_argument("--max-age", type=float,
+                        help="Reuse cached prices younger than this many seconds, regardless of asset class")
+    parser.add_argument("--force", action="store_true", help="Ignore cached prices and refetch everything")
+    parser.add_argument("--no-cache", action="store_true", help="Neither read nor write the price cache")
+    parser.add_argument("--report", metavar="PATH", help="Also write the summary report message to PATH")
+    parser.add_argument("--currency", action="append", default=[], metavar="CCY",
+                        help="Also value holdings in this currency (value_<ccy>); repeatable")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running: refetch each holding while its market is open, on an adaptive interval")
+    parser.add_argument("--threshold", type=float, default=EMIT_THRESHOLD * 100, metavar="PCT",
+                        help="With --watch, rewrite the output only when the total moves by this percent")
+    parser.add_argument("--deadline", type=float, default=RUN_DEADLINE, metavar="SECONDS",
+                        help="Time budget for the run; anything unpriced by then uses its last known price "
+                             "(0 for no deadline)")
+    parser.add_argument("--batch", nargs="+", metavar="PORTFOLIO",
+                        help="Value several portfolio files in one run, fetching shared tickers once; "
+                             "writes <name>.prices.json per portfolio")
+    parser.add_argument("--output-dir", metavar="DIR",
+                        help="With --batch, write the outputs here instead of next to each portfolio")
+    parser.add_argument("--no-metrics", action="store_true",
+                        help="Do not write the per-call metrics log and Prometheus file")
+    args = parser.parse_args(argv)
+    if args.batch and (args.watch or args.report):
+        parser.error("--batch cannot be combined with --watch or --report")
+
+    print("=" * 60)
+    print("Portfolio Price Update")
+    print("=" * 60)
+
+    cache = None if args.no_cache else PriceCache()
+    store = PriceHistory() if history else None
+    run = None if args.no_metrics or args.watch else metrics.RunMetrics()
+    try:
+        currencies = [currency.upper() for currency in args.currency]
+        if args.watch:
+            watcher = PriceWatcher(args.portfolio, args.output, cache=cache, currencies=currencies,
+                                   threshold=args.threshold / 100, history=store)
+            watcher.run()
+            return 0
+
+        if args.batch:
+            outputs = batch_outputs(args.batch, args.output_dir)
+            with metrics.collect(run):
+                results = fetch_portfolios(args.batch, cache=cache, max_age=args.max_age, force=args.force,
+                                           currencies=currencies, deadline=args.deadline or None,
+                                           history=store)
+            for path, output, prices in zip(args.batch, outputs, results):
+                with open(output, 'w') as f:
+                    json.dump(prices, f, indent=2)
+                print("\n" + "=" * 60)
+                print(f"{path}: prices saved to {output}")
+                print_totals(prices, currencies)
+            print("=" * 60)
+            if cache:
+                print(f"Cache: {cache.hits} hits, {cache.misses} misses")
+            print("=" * 60)
+            return 0
+
+        with metrics.collect(run):
+            prices = fetch_all_prices(args.portfolio, cache=cache, max_age=args.max_age, force=args.force,
+                                      currencies=currencies, deadline=args.deadline or None,
+                                      history=store)
+
+        with open(args.output, 'w') as f:
+            json.dump(prices, f, indent=2)
+
+        print("\n" + "=" * 60)
+        print(f"Prices saved to {args.output}")
+        if store:
+            rows = store.append(prices)
+            print(f"History: appended {rows} rows")
+        if args.report:
+            with open(args.report, 'w') as f:
+                f.write(build_report(prices, store))
+            print(f"Report saved to {args.report}")
+
+        print_totals(prices, currencies)
+        print(f"USD/BRL rate: {prices['usd_brl_rate']:.4f}")
+        if cache:
+            print(f"Cache: {cache.hits} hits, {cache.misses} misses")
+        print("=" * 60)
+
+    except Exception as e:
+        print(f"\nError: {e}")
+        return 1
+    finally:
+        if cache:
+            cache.close()
+        if run:
+            # Written for failed runs too: those are the ones worth looking at
+            print(f"Metrics: {len(run.events)} events appended to {run.write()}")
+
+    return 0
@@ -0,0 +1,296 @@
+"""Valuation of a portfolio.json through the configured price providers."""
+
+import json
+import os
+from collections import defaultdict
+from concurrent.futures import TimeoutError as FutureTimeout
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from . import metrics
+from .cache import PriceCache
+from .fx import FxMatrix, fx_holding, required_currencies
+from .history import PriceHistory
+from .limits import DaemonPool, Deadline
+from .providers import LastKnownProvider, PriceProvider
+from .resolver import Resolver, default_resolver
+
+PORTFOLIO_PATH = os.path.expanduser("~/vault/projects/Fin/portfolio.json")
+OUTPUT_PATH = os.path.expanduser("~/vault/projects/Fin/current_prices.json")
+
+MAX_WORKERS = 8
+# Time budget of a fetch_prices.py run, in seconds
+RUN_DEADLINE = 60.0
+
+
+def _rounded(value: float, digits: int) -> Optional[float]:
+    return round(float(value), digits) if np.isfinite(value) else None
+
+
+def _age_text(seconds: float) -> str:
+    if seconds < 3600:
+        return f"{seconds / 60:.0f}m"
+    if seconds < 2 * 86400:
+        return f"{seconds / 3600:.0f}h"
+    return f"{seconds / 86400:.0f}d"
+
+
+def resolve_prices(holdings: List[Dict], resolver: Resolver, cache: Optional[PriceCache] = None,
+                   max_age: Optional[float] = None, force: bool = False, deadline: Optional[Deadline] = None,
+                   last_known: Optional[LastKnownProvider] = None
+                   ) -> List[Tuple[Optional[float], Optional[PriceProvider]]]:
+    """
+    Price every holding, returning (price, provider) in input order.
+
+    Each holding is tried against its provider chain in turn. At each step the
+    holdings still unpriced are grouped per provider, served from the cache
+    where fresh, and the rest fetched with one concurrent call per provider.
+    Where each price came from is recorded for the active run metrics.
+
+    With a `deadline`, network providers are only waited for until it passes
+    and are not called after it; local ones (no limit) still run. Holdings
+    left unpriced then get their `last_known` price, if one is given.
+    """
+    chains = [resolver.route(holding) for holding in holdings]
+    results: List[Tuple[Optional[float], Optional[PriceProvider]]] = [(None, None)] * len(holdings)
+    steps = [0] * len(holdings)
+    cached: set = set()
+    providers = resolver.providers()
+    for provider in providers:
+        provider.deadline = deadline
+
+    # Provider tasks fan their chunks and single quotes out to `pool`, so they
+    # get a pool of their own: a task never waits on work queued behind it
+    tasks = DaemonPool(max(len(providers), 1), "provider")
+    pool = DaemonPool(MAX_WORKERS, "quotes")
+    try:
+        step = 0
+        while True:
+            wanted: Dict[PriceProvider, Dict[str, Dict]] = defaultdict(dict)
+            owners: Dict[Tuple[PriceProvider, str], List[int]] = defaultdict(list)
+            for index, holding in enumerate(holdings):
+                if results[index][0] or step >= len(chains[index]):
+                    continue
+                provider = chains[index][step]
+                symbol = provider.symbol(holding)
+                if symbol:
+                    wanted[provider].setdefault(symbol, holding)
+                    owners[(provider, symbol)].append(index)
+            if not wanted:
+                break
+
+            found: Dict[PriceProvider, Dict[str, float]] = {}
+            stale: Dict[PriceProvider, Dict[str, Dict]] = {}
+            for provider, symbols in wanted.items():
+                found[provider] = {}
+                if cache and provider.cacheable and not force:
+                    classes = {s: (h['type'], h['localCurrency']) for s, h in symbols.items()}
+                    found[provider] = cache.lookup(provider.name, classes, max_age)
+                    cached.update((provider, symbol) for symbol in found[provider])
+                stale[provider] = {s: h for s, h in symbols.items() if s not in found[provider]}
+
+            futures = {provider: tasks.submit(provider.fetch, symbols, pool)
+                       for provider, symbols in stale.items()
+                       if symbols and not (deadline and deadline.expired() and provider.limit)}
+            for provider, future in futures.items():
+                try:
+                    fetched = future.result(timeout=deadline.remaining() if deadline and provider.limit else None)
+                except FutureTimeout:
+                    print(f"⚠️  {provider.name}: no answer within the {deadline.seconds:.0f}s deadline")
+                    continue
+                except Exception as e:
+                    print(f"⚠️  {provider.name}: {type(e).__name__}: {e}")
+                    continue
+                if cache and provider.cacheable:
+                    cache.put(provider.name, fetched)
+                found[provider].update(fetched)
+
+            for provider, prices in found.items():
+                for symbol, price in prices.items():
+                    for index in owners.get((provider, symbol), []):
+                        results[index] = (price, provider)
+                        steps[index] = step
+            step += 1
+    finally:
+        # Do not wait for calls still running past the deadline; their results are
+        # dropped, and their daemon threads do not hold up the process's exit
+        for executor in (tasks, pool):
+            executor.shutdown(wait=deadline is None, cancel_futures=True)
+        for provider in providers:
+            provider.deadline = None
+
+    unpriced = [index for index, (price, _) in enumerate(results) if not price]
+    if last_known and unpriced:
+        wanted = {last_known.symbol(holdings[index]): holdings[index] for index in unpriced}
+        found = last_known.fetch({symbol: holding for symbol, holding in wanted.items() if symbol})
+        for index in unpriced:
+            price = found.get(last_known.symbol(holdings[index]))
+            if price:
+                results[index] = (price, last_known)
+                steps[index] = len(chains[index])
+
+    if metrics.active():
+        for index, (holding, (price, provider)) in enumerate(zip(holdings, results)):
+            if not price:
+                metrics.record_holding(holding['ticker'], None, "missing", len(chains[index]) - 1)
+                continue
+            if provider is last_known:
+                metrics.record_holding(holding['ticker'], provider.name, "last_known", steps[index],
+                                       provider.age(holding))
+                continue
+            symbol = provider.symbol(holding)
+            age = cache.ages.get((provider.name, symbol)) if (provider, symbol) in cached else None
+            outcome = "fallback" if steps[index] else "cache" if age is not None else "fetched"
+            metrics.record_holding(holding['ticker'], provider.name, outcome, steps[index], age)
+    return results
+
+
+def fetch_all_prices(portfolio_path: str = PORTFOLIO_PATH, cache: Optional[PriceCache] = None,
+                     max_age: Optional[float] = None, force: bool = False,
+                     resolver: Optional[Resolver] = None, currencies: Sequence[str] = (),
+                     deadline: Optional[float] = None, history: Optional[PriceHistory] = None) -> Dict:
+    """
+    Fetch current prices for all holdings in the portfolio.
+
+    Provider calls run concurrently on a bounded thread pool, each provider
+    throttled by its own limit. Holdings keep portfolio order. With a cache,
+    only prices that are stale under their asset class policy (or older than
+    `max_age` seconds) are fetched; `force` refetches everything.
+
+    The USD rate of every currency held, plus any in `currencies`, is priced
+    with the holdings; each holding also gets a value_<ccy> entry per
+    requested reporting currency.
+
+    With `deadline` (seconds), providers still busy when it passes are
+    abandoned. Any holding or rate left unpriced, for whatever reason, then
+    gets its last known good price from `cache` (at any age) or `history`.
+    Those entries are marked "stale" with their "price_age" in seconds.
+    """
+    return fetch_portfolios([portfolio_path], cache, max_age, force, resolver, currencies, deadline, history)[0]
+
+
+def fetch_portfolios(portfolio_paths: Sequence[str], cache: Optional[PriceCache] = None,
+                     max_age: Optional[float] = None, force: bool = False,
+                     resolver: Optional[Resolver] = None, currencies: Sequence[str] = (),
+                     deadline: Optional[float] = None, history: Optional[PriceHistory] = None) -> List[Dict]:
+    """
+    Value several portfolios in one run, returning one prices document per path.
+
+    The holdings of all portfolios are priced together, so a symbol or FX
+    pair they share is looked up and fetched once. The cost of a batch grows
+    with the distinct tickers, not with the number of portfolios. Options are
+    as for fetch_all_prices.
+    """
+    run_deadline = Deadline(deadline) if deadline else None
+    portfolios = []
+    for path in portfolio_paths:
+        with open(path, 'r') as f:
+            portfolios.append(json.load(f)['holdings'])
+    holdings = [holding for portfolio in portfolios for holding in portfolio]
+    resolver = resolver or default_resolver()
+
+    with metrics.call("engine", "fetch_all_prices") as call:
+        # BRL is always priced since usd_brl_rate is part of the output
+        needed = required_currencies(holdings, ["BRL", *currencies])
+        last_known = LastKnownProvider(resolver, cache, history) if cache or history else None
+        resolved = resolve_prices([*map(fx_holding, needed), *holdings], resolver, cache, max_age, force,
+                                  run_deadline, last_known)
+        rates = dict(zip(needed, resolved[:len(needed)]))
+        resolved = resolved[len(needed):]
+        if cache:
+            print(f"Cache: {cache.hits} hits, {cache.misses} misses")
+        call.result(sum(1 for price, _ in resolved if price), len(holdings))
+
+        results = []
+        start = 0
+        for path, portfolio in zip(portfolio_paths, portfolios):
+            if len(portfolio_paths) > 1:
+                print(f"\n--- {path} ---")
+            own = required_currencies(portfolio, ["BRL", *currencies])
+            results.append(value_holdings(portfolio, resolved[start:start + len(portfolio)], own,
+                                          [rates[currency] for currency in own], resolver, currencies))
+            start += len(portfolio)
+        return results
+
+
+def value_holdings(holdings: List[Dict], resolved: List[Tuple[Optional[float], Optional[PriceProvider]]],
+                   needed: Sequence[str], rates: List[Tuple[Optional[float], Optional[PriceProvider]]],
+                   resolver: Resolver, currencies: Sequence[str] = (), verbose: bool = True) -> Dict:
+    """
+    Build the current_prices document from resolved prices and USD rates.
+
+    `resolved` pairs with `holdings` and `rates` with the `needed`
+    currencies, as resolve_prices returns them. Raises ValueError if a
+    needed rate is missing.
+    """
+    fx = FxMatrix({currency: rate for currency, (rate, _) in zip(needed, rates) if rate})
+    missing = [currency for currency in needed if currency not in fx]
+    if missing:
+        raise ValueError(f"Unable to fetch {', '.join(missing)} exchange rate")
+    stale_rates = {currency: provider.age(fx_holding(currency))
+                   for currency, (_, provider) in zip(needed, rates) if isinstance(provider, LastKnownProvider)}
+    if verbose:
+        for currency in needed:
+            note = f" (last known, {_age_text(stale_rates[currency])} old)" if currency in stale_rates else ""
+            print(f"USD/{currency} rate: {fx.per_usd[currency]:.4f}{note}")
+
+    local = [holding['localCurrency'] for holding in holdings]
+    quoted = [provider.currency(holding) if provider else holding['localCurrency']
+              for holding, (_, provider) in zip(holdings, resolved)]
+    price = np.array([p or np.nan for p, _ in resolved], dtype=np.float64)
+    quantity = np.array([holding['quantity'] for holding in holdings], dtype=np.float64)
+
+    price_local = fx.convert(price, quoted, local)
+    price_usd = fx.convert(price, quoted, "USD")
+    value_local = price_local * quantity
+    reporting = {currency: fx.convert(value_local, local, currency)
+                 for currency in currencies if currency != "USD"}
+
+    prices = {
+        "timestamp": datetime.now().isoformat(),
+        "usd_brl_rate": fx.per_usd["BRL"],
+        "fx_rates": {currency: fx.per_usd[currency] for currency in needed},
+        "holdings": []
+    }
+    if stale_rates:
+        prices["stale_rates"] = {currency: round(age) for currency, age in stale_rates.items()}
+
+    for i, (holding, (_, provider)) in enumerate(zip(holdings, resolved)):
+        asset = holding['asset']
+        ticker = holding['ticker']
+        local_currency = holding['localCurrency']
+
+        price_entry = {
+            "asset": asset,
+            "ticker": ticker,
+            "type": holding['type'],
+            "local_currency": local_currency,
+            "price_local": _rounded(price_local[i], 4),
+            "price_usd": _rounded(price_usd[i], 4),
+            "quantity": holding['quantity'],
+            "value_local": _rounded(value_local[i], 2),
+            "value_usd": _rounded(price_usd[i] * quantity[i], 2)
+        }
+        for currency, values in reporting.items():
+            price_entry[f"value_{currency.lower()}"] = _rounded(values[i], 2)
+        stale = isinstance(provider, LastKnownProvider)
+        if stale:
+            price_entry["stale"] = True
+            price_entry["price_age"] = round(provider.age(holding))
+
+        prices['holdings'].append(price_entry)
+
+        if not verbose:
+            continue
+        print(f"\n{asset} ({ticker})")
+        if np.isfinite(price_local[i]):
+            source = f" [{provider.name}]" if len(resolver.route(holding)) > 1 else ""
+            if stale:
+                source = f" [last known, {_age_text(price_entry['price_age'])} old]"
+            print(f"  {price_local[i]:.2f} {local_currency} (${price_usd[i]:.2f} USD){source}")
+        else:
+            print(f"  Unable to fetch price")
+
+    return prices
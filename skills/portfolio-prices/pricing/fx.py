@@ -0,0 +1,69 @@
+"""
+Exchange rates for every currency a portfolio needs.
+
+Rates are held as units of each currency per USD, the way Yahoo quotes its
+"<CCY>=X" pairs. Those pairs are priced like any other quote: batched with the
+holdings and cached with the FX freshness policy. Any cross rate is then a
+ratio of two entries, so a whole column of amounts converts in one array
+expression.
+"""
+
+from typing import Dict, Iterable, List, Sequence, Union
+
+import numpy as np
+
+BASE_CURRENCY = "USD"
+
+
+def fx_symbol(currency: str) -> str:
+    """Yahoo symbol quoting `currency` per USD."""
+    return f"{currency}=X"
+
+
+def fx_holding(currency: str) -> Dict:
+    """Pseudo-holding priced as the USD/`currency` rate."""
+    return {
+        "asset": f"USD/{currency}",
+        "ticker": fx_symbol(currency),
+        "type": "FX",
+        "localCurrency": currency,
+        "quantity": 0,
+    }
+
+
+def required_currencies(holdings: Iterable[Dict], reporting: Sequence[str] = ()) -> List[str]:
+    """Non-USD currencies needed to value `holdings` and report in `reporting`."""
+    currencies = {h['localCurrency'] for h in holdings} | set(reporting)
+    currencies.discard(BASE_CURRENCY)
+    return sorted(currencies)
+
+
+class FxMatrix:
+    """Conversion between any pair of currencies from per-USD rates."""
+
+    def __init__(self, per_usd: Dict[str, float]):
+        self.per_usd = {BASE_CURRENCY: 1.0, **per_usd}
+        self.currencies = sorted(self.per_usd)
+        self._rates = np.array([self.per_usd[c] for c in self.currencies])
+
+    def __contains__(self, currency: str) -> bool:
+        return currency in self.per_usd
+
+    def rate(self, source: str, target: str) -> float:
+        """Units of `target` per unit of `source`."""
+        return self.per_usd[target] / self.per_usd[source]
+
+    def matrix(self) -> np.ndarray:
+        """Full cross-rate matrix; entry [i, j] converts currencies[i] into currencies[j]."""
+        return self._rates[np.newaxis, :] / self._rates[:, np.newaxis]
+
+    def rates(self, currencies: Union[str, Sequence[str]]) -> Union[float, np.ndarray]:
+        """Per-USD rate of one currency or of each in a sequence; NaN where unknown."""
+        if isinstance(currencies, str):
+            return self.per_usd.get(currencies, np.nan)
+        return np.array([self.per_usd.get(c, np.nan) for c in currencies], dtype=np.float64)
+
+    def convert(self, amounts: np.ndarray, source: Union[str, Sequence[str]],
+                target: Union[str, Sequence[str]]) -> np.ndarray:
+        """Convert amounts from `source` into `target`; each is one currency or one per amount."""
+        return np.asarray(amounts, dtype=np.float64) / self.rates(source) * self.rates(target)
@@ -0,0 +1,218 @@
+"""
+Append-only price history for the portfolio.
+
+Every pricing run appends one fixed-size record per holding to a monthly
+partition file (history/YYYY-MM.bin). Partitions are plain NumPy record
+arrays, so a range read only loads the months it touches and movers over
+any window come from array operations instead of per-holding dict lookups.
+
+Usage:
+    python price_history.py [--window last|1d|1w|1m|ytd] [--threshold PCT] [--top N]
+"""
+
+import argparse
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+HISTORY_DIR = os.path.expanduser("~/vault/projects/Fin/history")
+
+HISTORY_DTYPE = np.dtype([
+    ("timestamp", "datetime64[s]"),
+    ("ticker", "S32"),
+    ("price_local", "f8"),
+    ("price_usd", "f8"),
+    ("usd_brl_rate", "f8"),
+])
+
+MOVERS_DTYPE = np.dtype([("ticker", "S32"), ("prev", "f8"), ("curr", "f8"), ("pct", "f8")])
+
+WINDOWS = {
+    "1d": np.timedelta64(1, "D"),
+    "1w": np.timedelta64(7, "D"),
+    "1m": np.timedelta64(30, "D"),
+}
+
+# How far before a window start to look for each ticker's baseline price
+LOOKBACK = np.timedelta64(31, "D")
+
+
+def _month(ts: np.datetime64) -> str:
+    return str(ts.astype("datetime64[M]"))
+
+
+class PriceHistory:
+    """Month-partitioned, append-only store of per-run holding prices."""
+
+    def __init__(self, root: str = HISTORY_DIR):
+        self.root = root
+
+    def _partition(self, month: str) -> str:
+        return os.path.join(self.root, f"{month}.bin")
+
+    def append(self, prices: Dict) -> int:
+        """Append one record per holding from a fetch_all_prices result; returns rows written."""
+        holdings = prices["holdings"]
+        rows = np.zeros(len(holdings), dtype=HISTORY_DTYPE)
+        ts = np.datetime64(prices["timestamp"], "s")
+        rows["timestamp"] = ts
+        rows["ticker"] = [str(h["ticker"]).encode("utf-8")[:32] for h in holdings]
+        # Last-known-good prices are not new observations, so they are stored as missing
+        rows["price_local"] = [np.nan if h["price_local"] is None or h.get("stale") else h["price_local"]
+                               for h in holdings]
+        rows["price_usd"] = [np.nan if h["price_usd"] is None or h.get("stale") else h["price_usd"]
+                             for h in holdings]
+        rows["usd_brl_rate"] = prices["usd_brl_rate"]
+
+        os.makedirs(self.root, exist_ok=True)
+        with open(self._partition(_month(ts)), "ab") as f:
+            f.write(rows.tobytes())
+        return len(rows)
+
+    def months(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name[:-4] for name in os.listdir(self.root) if name.endswith(".bin"))
+
+    def read(self, start: Optional[np.datetime64] = None, end: Optional[np.datetime64] = None) -> np.ndarray:
+        """Return all records with start <= timestamp <= end, in append order."""
+        first = _month(start) if start is not None else None
+        last = _month(end) if end is not None else None
+        parts = []
+        for month in self.months():
+            if (first and month < first) or (last and month > last):
+                continue
+            path = self._partition(month)
+            # Drop a trailing partial record left by an interrupted write
+            count = os.path.getsize(path) // HISTORY_DTYPE.itemsize
+            parts.append(np.fromfile(path, dtype=HISTORY_DTYPE, count=count))
+        if not parts:
+            return np.zeros(0, dtype=HISTORY_DTYPE)
+        rows = np.concatenate(parts)
+        mask = np.ones(len(rows), dtype=bool)
+        if start is not None:
+            mask &= rows["timestamp"] >= start
+        if end is not None:
+            mask &= rows["timestamp"] <= end
+        return rows[mask]
+
+    def last_prices(self, tickers: List[str]) -> Dict[str, Tuple[float, float]]:
+        """Latest recorded (price_local, unix time) of each ticker, newest partitions first."""
+        wanted = np.array([str(t).encode("utf-8")[:32] for t in tickers])
+        found: Dict[str, Tuple[float, float]] = {}
+        for month in reversed(self.months()):
+            rows = self.read(start=np.datetime64(month, "s"),
+                             end=np.datetime64(month, "M") + np.timedelta64(1, "M") - np.timedelta64(1, "s"))
+            rows = rows[np.isfinite(rows["price_local"]) & np.isin(rows["ticker"], wanted)]
+            if len(rows):
+                # Newest row first within each ticker
+                ordered = rows[np.lexsort((rows["timestamp"], rows["ticker"]))[::-1]]
+                names, first = np.unique(ordered["ticker"], return_index=True)
+                for name, row in zip(names, ordered[first]):
+                    found.setdefault(name.decode(), (float(row["price_local"]),
+                                                     float(row["timestamp"].astype(np.int64))))
+            if len(found) == len(set(wanted)):
+                break
+        return found
+
+    def movers(self, window: str = "last", threshold: float = 0.0) -> np.ndarray:
+        """
+        Price change per ticker between the latest run and the start of `window`.
+
+        `window` is "last" (previous run), "1d", "1w", "1m" or "ytd". The
+        baseline is each ticker's last price at or before the window start, or
+        its first price inside the window when history is shorter than that.
+        Returns a record array (ticker, prev, curr, pct) sorted by |pct|
+        descending, keeping moves with |pct| > threshold.
+        """
+        latest = self._latest_timestamp()
+        if latest is None:
+            return _empty_movers()
+
+        if window == "last":
+            cutoff = self._latest_timestamp(before=latest)
+            if cutoff is None:
+                return _empty_movers()
+        elif window == "ytd":
+            cutoff = latest.astype("datetime64[Y]").astype("datetime64[s]")
+        elif window in WINDOWS:
+            cutoff = latest - WINDOWS[window]
+        else:
+            raise ValueError(f"Unknown window: {window}")
+
+        rows = self.read(start=cutoff if window == "last" else cutoff - LOOKBACK, end=latest)
+        current = rows[rows["timestamp"] == latest]
+        history = rows[(rows["timestamp"] < latest) & np.isfinite(rows["price_local"])]
+
+        before = history[history["timestamp"] <= cutoff]
+        inside = history[history["timestamp"] > cutoff]
+        base_tickers, base_prices = _last_per_ticker(before)
+        in_tickers, in_prices = _first_per_ticker(inside)
+        extra = ~np.isin(in_tickers, base_tickers)
+        base_tickers = np.concatenate([base_tickers, in_tickers[extra]])
+        base_prices = np.concatenate([base_prices, in_prices[extra]])
+
+        _, cur_idx, base_idx = np.intersect1d(current["ticker"], base_tickers, return_indices=True)
+        prev = base_prices[base_idx]
+        curr = current["price_local"][cur_idx]
+        valid = np.isfinite(prev) & np.isfinite(curr) & (prev > 0)
+
+        result = np.zeros(int(valid.sum()), dtype=MOVERS_DTYPE)
+        result["ticker"] = current["ticker"][cur_idx][valid]
+        result["prev"] = prev[valid]
+        result["curr"] = curr[valid]
+        result["pct"] = (result["curr"] - result["prev"]) / result["prev"] * 100
+        result = result[np.abs(result["pct"]) > threshold]
+        return result[np.argsort(-np.abs(result["pct"]), kind="stable")]
+
+    def _latest_timestamp(self, before: Optional[np.datetime64] = None) -> Optional[np.datetime64]:
+        # Partitions are append-only and time ordered, so scan newest first
+        for month in reversed(self.months()):
+            if before is not None and month > _month(before):
+                continue
+            stamps = self.read(start=np.datetime64(month, "s"), end=before)["timestamp"]
+            if before is not None:
+                stamps = stamps[stamps < before]
+            if len(stamps):
+                return stamps.max()
+        return None
+
+
+def _empty_movers() -> np.ndarray:
+    return np.zeros(0, dtype=MOVERS_DTYPE)
+
+
+def _last_per_ticker(rows: np.ndarray):
+    order = np.lexsort((rows["timestamp"], rows["ticker"]))
+    ordered = rows[order][::-1]
+    tickers, idx = np.unique(ordered["ticker"], return_index=True)
+    return tickers, ordered["price_local"][idx]
+
+
+def _first_per_ticker(rows: np.ndarray):
+    order = np.lexsort((rows["timestamp"], rows["ticker"]))
+    ordered = rows[order]
+    tickers, idx = np.unique(ordered["ticker"], return_index=True)
+    return tickers, ordered["price_local"][idx]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show portfolio movers from the price history")
+    parser.add_argument("--window", default="last", choices=["last", *WINDOWS, "ytd"],
+                        help="Compare the latest run against this window start")
+    parser.add_argument("--threshold", type=float, default=0.0, help="Only show moves above this %%")
+    parser.add_argument("--top", type=int, default=10, help="Number of movers to show")
+    args = parser.parse_args()
+
+    movers = PriceHistory().movers(args.window, args.threshold)
+    if not len(movers):
+        print("No movers (not enough history yet?)")
+        return 0
+    for row in movers[:args.top]:
+        print(f"{row['ticker'].decode():<28} {row['prev']:>12.2f} → {row['curr']:>12.2f} ({row['pct']:+.1f}%)")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,245 @@
+"""
+Concurrency caps, rate limits, retries and circuit breakers for price providers.
+
+Every network call a provider makes goes through its ProviderLimit. A failed
+call is retried with jittered exponential backoff. After several calls in a
+row have failed, the provider's circuit opens and further calls fail at once
+until a cooldown has passed. A run-wide Deadline stops retries, and new
+calls, once the run is out of time, and cuts the timeout of the requests
+still in flight down to the time left.
+"""
+
+import queue
+import random
+import threading
+import time
+from concurrent.futures import Executor, Future
+from typing import Optional
+
+from . import metrics
+
+RETRY_ATTEMPTS = 3
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 4.0
+# Consecutive failed calls (after their retries) that open a provider's circuit
+BREAKER_THRESHOLD = 3
+BREAKER_COOLDOWN = 60.0
+# Timeout of one HTTP request, in seconds
+REQUEST_TIMEOUT = 10.0
+# Request timeout of the ProviderLimit call running on this thread
+_local = threading.local()
+
+
+class DeadlineExceeded(TimeoutError):
+    """The run's time budget ran out before the call could be made."""
+
+
+class CircuitOpenError(RuntimeError):
+    """The provider failed repeatedly and is not being called for now."""
+
+
+class Deadline:
+    """Point in time by which a pricing run must be finished."""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+
+def request_timeout() -> float:
+    """Timeout for a request made on this thread: REQUEST_TIMEOUT, or less when the run's deadline is nearer."""
+    return getattr(_local, "timeout", REQUEST_TIMEOUT)
+
+
+class DaemonPool(Executor):
+    """
+    Thread pool whose workers are daemon threads.
+
+    ThreadPoolExecutor joins its workers at interpreter exit, so a request
+    that hangs past the deadline would keep the process alive anyway. These
+    workers are dropped when the process ends. Workers start on demand, up to
+    `max_workers`.
+    """
+
+    def __init__(self, max_workers: int, name: str = "pricing"):
+        self.max_workers = max_workers
+        self.name = name
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._threads = []
+        self._idle = threading.Semaphore(0)
+        self._lock = threading.Lock()
+        self._shutdown = False
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            future = Future()
+            self._queue.put((future, fn, args, kwargs))
+            if not self._idle.acquire(blocking=False) and len(self._threads) < self.max_workers:
+                thread = threading.Thread(target=self._work, name=f"{self.name}-{len(self._threads)}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            return future
+
+    def _work(self) -> None:
+        while True:
+            task = self._queue.get()
+            if task is None:
+                return
+            future, fn, args, kwargs = task
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+            del task, future
+            self._idle.release()
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        with self._lock:
+            self._shutdown = True
+            if cancel_futures:
+                while True:
+                    try:
+                        task = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if task is not None:
+                        task[0].cancel()
+            for _ in self._threads:
+                self._queue.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilling `rate` tokens per second up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a token is available, then take it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Closed while calls succeed; open for `cooldown` seconds after `threshold` failures in a row.
+
+    Once the cooldown has passed, one trial call is let through (half-open).
+    Its success closes the circuit again, its failure reopens it.
+    """
+
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, cooldown: float = BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record(self, ok: bool) -> None:
+        with self._lock:
+            self._trial = False
+            if ok:
+                self.failures, self.opened_at = 0, None
+                return
+            self.failures += 1
+            if self.opened_at is not None or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+class ProviderLimit:
+    """Concurrency cap, rate limit, retry policy and circuit breaker shared by every call to one provider."""
+
+    def __init__(self, name: str, max_concurrency: int, rate: float, burst: int,
+                 attempts: int = RETRY_ATTEMPTS, backoff: float = BACKOFF_BASE,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.name = name
+        self.attempts = attempts
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._bucket = TokenBucket(rate, burst)
+
+    def call(self, func, *args, deadline: Optional[Deadline] = None):
+        """
+        Run `func(*args)`, retrying it when it raises.
+
+        Raises the last error once the attempts are used up, CircuitOpenError
+        while the circuit is open, and DeadlineExceeded when `deadline` passes
+        before an attempt could start. Requests made by `func` should use
+        request_timeout(), which is cut to the time left before `deadline`.
+        """
+        error: Optional[Exception] = None
+        for attempt in range(self.attempts):
+            if deadline and deadline.expired():
+                self._give_up(error, "deadline")
+                raise DeadlineExceeded(f"{self.name}: pricing deadline reached") from error
+            if not self.breaker.allow():
+                self._give_up(error, "circuit_open")
+                raise CircuitOpenError(f"{self.name}: circuit open after repeated failures") from error
+            with self._slots:
+                self._bucket.acquire()
+                _local.timeout = min(REQUEST_TIMEOUT, max(deadline.remaining(), 0.1)) if deadline else REQUEST_TIMEOUT
+                try:
+                    with metrics.attempt(attempt):
+                        result = func(*args)
+                except Exception as e:
+                    error = e
+                else:
+                    self.breaker.record(True)
+                    return result
+                finally:
+                    _local.timeout = REQUEST_TIMEOUT
+            if attempt + 1 < self.attempts:
+                # Full jitter: anywhere up to the exponential step, so retries spread out
+                delay = random.uniform(0, min(BACKOFF_CAP, self.backoff * 2 ** attempt))
+                time.sleep(min(delay, deadline.remaining()) if deadline else delay)
+        self.breaker.record(False)
+        raise error
+
+    def _give_up(self, error: Optional[Exception], reason: str) -> None:
+        # A call that already failed an attempt still counts as a failure
+        if error is not None:
+            self.breaker.record(False)
+        with metrics.call(self.name, "skipped") as call:
+            call.outcome = reason
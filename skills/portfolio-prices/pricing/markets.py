@@ -0,0 +1,172 @@
+"""
+Exchange calendar for the pricing engine.
+
+Regular session hours per local currency, plus the full-day holidays of B3 and
+NYSE, computed per year from fixed dates, weekday rules and Easter. Other
+exchanges are treated as open on every weekday. Crypto trades around the
+clock. FX trades from Monday to Friday, New York time.
+"""
+
+from datetime import date, datetime, time as dtime, timedelta
+from functools import lru_cache
+from typing import FrozenSet
+from zoneinfo import ZoneInfo
+
+# Regular trading session per local currency: (timezone, open, close)
+EXCHANGE_HOURS = {
+    "BRL": ("America/Sao_Paulo", dtime(10, 0), dtime(18, 0)),
+    "CHF": ("Europe/Zurich", dtime(9, 0), dtime(17, 30)),
+    "EUR": ("Europe/Amsterdam", dtime(9, 0), dtime(17, 30)),
+    "SGD": ("Asia/Singapore", dtime(9, 0), dtime(17, 0)),
+    "TWD": ("Asia/Taipei", dtime(9, 0), dtime(13, 30)),
+    "USD": ("America/New_York", dtime(9, 30), dtime(16, 0)),
+}
+
+FX_TZ = ZoneInfo("America/New_York")
+
+
+def easter(year: int) -> date:
+    """Gregorian Easter Sunday (anonymous Gregorian algorithm)."""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = divmod(b, 4)
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """The n-th `weekday` (0 = Monday) of a month; n = -1 for the last one."""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _observed(day: date) -> date:
+    """NYSE rule: a Saturday holiday is taken on Friday, a Sunday one on Monday."""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+@lru_cache(maxsize=None)
+def nyse_holidays(year: int) -> FrozenSet[date]:
+    days = {
+        _nth_weekday(year, 1, 0, 3),    # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),    # Washington's Birthday
+        easter(year) - timedelta(days=2),  # Good Friday
+        _nth_weekday(year, 5, 0, -1),   # Memorial Day
+        _observed(date(year, 7, 4)),
+        _nth_weekday(year, 9, 0, 1),    # Labor Day
+        _nth_weekday(year, 11, 3, 4),   # Thanksgiving
+        _observed(date(year, 12, 25)),
+    }
+    # New Year's Day on a Saturday is not moved back into the old year
+    if date(year, 1, 1).weekday() != 5:
+        days.add(_observed(date(year, 1, 1)))
+    if year >= 2022:
+        days.add(_observed(date(year, 6, 19)))  # Juneteenth
+    return frozenset(days)
+
+
+@lru_cache(maxsize=None)
+def b3_holidays(year: int) -> FrozenSet[date]:
+    sunday = easter(year)
+    days = {
+        date(year, 1, 1),
+        sunday - timedelta(days=48),    # Carnival Monday
+        sunday - timedelta(days=47),    # Carnival Tuesday
+        sunday - timedelta(days=2),     # Good Friday
+        date(year, 4, 21),              # Tiradentes
+        date(year, 5, 1),
+        sunday + timedelta(days=60),    # Corpus Christi
+        date(year, 9, 7),
+        date(year, 10, 12),
+        date(year, 11, 2),
+        date(year, 11, 15),
+        date(year, 12, 24),
+        date(year, 12, 25),
+        date(year, 12, 31),
+    }
+    if year >= 2024:
+        days.add(date(year, 11, 20))    # Consciência Negra, national since 2024
+    return frozenset(days)
+
+
+HOLIDAYS = {
+    "BRL": b3_holidays,
+    "USD": nyse_holidays,
+}
+
+
+def is_trading_day(local_currency: str, day: date) -> bool:
+    holidays = HOLIDAYS.get(local_currency)
+    return day.weekday() < 5 and not (holidays and day in holidays(day.year))
+
+
+def _hours(local_currency: str):
+    tz_name, open_, close = EXCHANGE_HOURS.get(local_currency, EXCHANGE_HOURS["USD"])
+    return ZoneInfo(tz_name), open_, close
+
+
+def is_session_open(local_currency: str, now: float) -> bool:
+    """Whether the exchange for `local_currency` is in its regular session."""
+    tz, open_, close = _hours(local_currency)
+    local_now = datetime.fromtimestamp(now, tz)
+    return is_trading_day(local_currency, local_now.date()) and open_ <= local_now.time() < close
+
+
+def last_session_close(local_currency: str, now: float) -> float:
+    """Timestamp of the most recent session close at or before `now`."""
+    tz, _, close = _hours(local_currency)
+    local_now = datetime.fromtimestamp(now, tz)
+    day = local_now.date()
+    while True:
+        if is_trading_day(local_currency, day):
+            close_at = datetime.combine(day, close, tzinfo=tz)
+            if close_at <= local_now:
+                return close_at.timestamp()
+        day -= timedelta(days=1)
+
+
+def next_session_open(local_currency: str, now: float) -> float:
+    """Timestamp of the next session open after `now`, or `now` if the session is open."""
+    if is_session_open(local_currency, now):
+        return now
+    tz, open_, _ = _hours(local_currency)
+    local_now = datetime.fromtimestamp(now, tz)
+    day = local_now.date()
+    while True:
+        if is_trading_day(local_currency, day):
+            open_at = datetime.combine(day, open_, tzinfo=tz)
+            if open_at > local_now:
+                return open_at.timestamp()
+        day += timedelta(days=1)
+
+
+def is_fx_open(now: float) -> bool:
+    """FX trades from Sunday 17:00 to Friday 17:00 New York time."""
+    local_now = datetime.fromtimestamp(now, FX_TZ)
+    weekday, hour = local_now.weekday(), local_now.hour
+    if weekday == 5:
+        return False
+    if weekday == 6:
+        return hour >= 17
+    if weekday == 4:
+        return hour < 17
+    return True
+
+
+def next_fx_open(now: float) -> float:
+    if is_fx_open(now):
+        return now
+    local_now = datetime.fromtimestamp(now, FX_TZ)
+    sunday = local_now.date() + timedelta(days=(6 - local_now.weekday()) % 7)
+    return datetime.combine(sunday, dtime(17, 0), tzinfo=FX_TZ).timestamp()
@@ -0,0 +1,253 @@
+"""
+Instrumentation for pricing runs.
+
+Provider functions and the engine record one event per call: the provider
+and operation, the symbols involved, latency, outcome, retries and the age of
+the data returned. Each priced holding gets one event as well, saying where
+its price came from and how far down its provider chain that was. Events go to the active RunMetrics, so nothing is
+recorded unless a run is collecting.
+
+At the end of a run the events are appended to a monthly JSON-lines log
+(metrics/YYYY-MM.jsonl). A summary is written to metrics/pricing.prom in the
+Prometheus text format, for node_exporter's textfile collector. The summary
+includes how many runs in a row each ticker has failed to price.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional
+
+METRICS_DIR = os.path.expanduser("~/.cache/portfolio-prices/metrics")
+
+# Holding outcomes; the rest are call outcomes (ok, partial, empty, error)
+HOLDING_OUTCOMES = ("cache", "fetched", "fallback", "last_known", "missing")
+
+
+class Call:
+    """One instrumented call; the code being measured fills in its outcome, retries and data age."""
+
+    def __init__(self, provider: str, op: str, symbols: Iterable[str] = ()):
+        self.provider = provider
+        self.op = op
+        self.symbols = list(symbols)
+        self.outcome = "ok"
+        # Retry attempt of the ProviderLimit call this was (0 for the first try)
+        self.retries = 0
+        # How many alternate symbols were tried before the one that answered
+        self.fallback_step = 0
+        self.age: Optional[float] = None
+        self.count: Optional[int] = None
+        self.error: Optional[str] = None
+
+    def result(self, found: int, wanted: Optional[int] = None) -> None:
+        """Set the outcome from how many of the wanted items came back."""
+        wanted = len(self.symbols) if wanted is None else wanted
+        self.count = found
+        if self.outcome != "error":
+            self.outcome = "empty" if not found else "partial" if found < wanted else "ok"
+
+    def fail(self, error: Exception) -> None:
+        self.outcome = "error"
+        self.error = f"{type(error).__name__}: {error}"
+
+    def observe_age(self, age: Optional[float]) -> None:
+        """Keep the oldest data age seen by this call, in seconds."""
+        if age is not None:
+            self.age = age if self.age is None else max(self.age, age)
+
+
+class RunMetrics:
+    """Events of one pricing run, with JSON-lines and Prometheus output."""
+
+    def __init__(self, root: str = METRICS_DIR):
+        self.root = root
+        self.run_id = datetime.now().isoformat(timespec="seconds")
+        self.started = time.time()
+        self.events: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def add(self, event: Dict) -> None:
+        event = {"run": self.run_id, "ts": round(time.time(), 3), **event}
+        with self._lock:
+            self.events.append(event)
+
+    def calls(self) -> List[Dict]:
+        return [e for e in self.events if e["op"] != "holding"]
+
+    def holdings(self) -> List[Dict]:
+        return [e for e in self.events if e["op"] == "holding"]
+
+    def write_log(self) -> str:
+        """Append this run's events to the monthly log; returns its path."""
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, f"{self.run_id[:7]}.jsonl")
+        with open(path, "a") as f:
+            for event in self.events:
+                f.write(json.dumps(event) + "\n")
+        return path
+
+    def failure_streaks(self) -> Dict[str, int]:
+        """Consecutive runs each currently failing ticker has gone unpriced, this one included."""
+        path = os.path.join(self.root, "failures.json")
+        try:
+            with open(path) as f:
+                previous = json.load(f)
+        except (OSError, ValueError):
+            previous = {}
+        streaks = {}
+        for event in self.holdings():
+            if event["outcome"] == "missing":
+                ticker = event["symbols"][0]
+                streaks[ticker] = previous.get(ticker, 0) + 1
+        os.makedirs(self.root, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(streaks, f)
+        return streaks
+
+    def prometheus(self, streaks: Optional[Dict[str, int]] = None) -> str:
+        """The run summarised in the Prometheus text exposition format."""
+        calls: Dict[tuple, int] = defaultdict(int)
+        latency: Dict[tuple, List[float]] = defaultdict(lambda: [0.0, 0])
+        retries: Dict[tuple, int] = defaultdict(int)
+        ages: Dict[tuple, float] = {}
+        for event in self.calls():
+            key = (event["provider"], event["op"])
+            calls[(*key, event["outcome"])] += 1
+            latency[key][0] += event["latency"]
+            latency[key][1] += 1
+            retries[key] += event["retries"]
+            if event.get("age") is not None:
+                ages[key] = max(ages.get(key, 0.0), event["age"])
+        outcomes = defaultdict(int)
+        for event in self.holdings():
+            outcomes[event["outcome"]] += 1
+
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str, samples: Dict[tuple, float], labels: tuple = ()):
+            lines.append(f"# HELP portfolio_pricing_{name} {help_text}")
+            lines.append(f"# TYPE portfolio_pricing_{name} {kind}")
+            for key, value in sorted(samples.items()):
+                label = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(labels, key))
+                lines.append(f"portfolio_pricing_{name}{{{label}}} {value:g}" if label
+                             else f"portfolio_pricing_{name} {value:g}")
+
+        metric("last_run_timestamp_seconds", "gauge", "Start time of the last pricing run",
+               {(): round(self.started)})
+        metric("run_duration_seconds", "gauge", "Wall time of the last pricing run",
+               {(): round(time.time() - self.started, 3)})
+        metric("holdings", "gauge", "Holdings and FX rates by where their price came from in the last run",
+               {(o,): outcomes[o] for o in HOLDING_OUTCOMES}, ("outcome",))
+        metric("calls", "gauge", "Provider calls in the last run", calls, ("provider", "op", "outcome"))
+        metric("call_duration_seconds_sum", "gauge", "Total time spent in provider calls in the last run",
+               {k: round(v[0], 3) for k, v in latency.items()}, ("provider", "op"))
+        metric("call_duration_seconds_count", "gauge", "Provider calls timed in the last run",
+               {k: v[1] for k, v in latency.items()}, ("provider", "op"))
+        metric("call_retries", "gauge", "Retries made by provider calls in the last run", retries,
+               ("provider", "op"))
+        metric("data_age_seconds", "gauge", "Age of the oldest data a provider returned in the last run",
+               {k: round(v) for k, v in ages.items()}, ("provider", "op"))
+        if streaks is not None:
+            metric("ticker_failure_streak", "gauge", "Consecutive runs a ticker has gone unpriced",
+                   {(t,): n for t, n in streaks.items()}, ("ticker",))
+        return "\n".join(lines) + "\n"
+
+    def write(self) -> str:
+        """Write the JSON-lines log and the Prometheus file; returns the log path."""
+        log_path = self.write_log()
+        path = os.path.join(self.root, "pricing.prom")
+        text = self.prometheus(self.failure_streaks())
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(text)
+        # The textfile collector must never read a half-written file
+        os.replace(tmp, path)
+        return log_path
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_active: Optional[RunMetrics] = None
+# Retry attempt of the call running on this thread, set by ProviderLimit
+_local = threading.local()
+
+
+def active() -> Optional[RunMetrics]:
+    return _active
+
+
+@contextmanager
+def collect(metrics: RunMetrics) -> Iterator[RunMetrics]:
+    """Record every instrumented call made inside the block into `metrics`."""
+    global _active
+    previous, _active = _active, metrics
+    try:
+        yield metrics
+    finally:
+        _active = previous
+
+
+@contextmanager
+def attempt(number: int) -> Iterator[None]:
+    """Mark calls made inside the block as retry `number` (0 for the first try)."""
+    _local.attempt = number
+    try:
+        yield
+    finally:
+        _local.attempt = 0
+
+
+@contextmanager
+def call(provider: str, op: str, symbols: Iterable[str] = ()) -> Iterator[Call]:
+    """Time the block as one call; an exception escaping it counts as an error and is re-raised."""
+    current = Call(provider, op, symbols)
+    current.retries = getattr(_local, "attempt", 0)
+    start = time.perf_counter()
+    try:
+        yield current
+    except Exception as e:
+        current.fail(e)
+        raise
+    finally:
+        if _active is not None:
+            event = {"provider": provider, "op": op, "symbols": current.symbols,
+                     "latency": round(time.perf_counter() - start, 4), "outcome": current.outcome,
+                     "retries": current.retries}
+            if current.fallback_step:
+                event["fallback_step"] = current.fallback_step
+            for field in ("age", "count", "error"):
+                value = getattr(current, field)
+                if value is not None:
+                    event[field] = round(value, 1) if field == "age" else value
+            _active.add(event)
+
+
+def record_holding(ticker: str, provider: Optional[str], outcome: str, fallback_step: int = 0,
+                   age: Optional[float] = None) -> None:
+    """
+    Record where one holding's price came from: cache, fetched, fallback, last_known or missing.
+
+    `fallback_step` is the position in the holding's provider chain that
+    priced it (or was tried last), 0 being its first provider.
+    """
+    if _active is None:
+        return
+    event = {"provider": provider, "op": "holding", "symbols": [ticker], "outcome": outcome,
+             "fallback_step": fallback_step}
+    if age is not None:
+        event["age"] = round(age, 1)
+    _active.add(event)
+
+
+def bar_age(timestamp) -> Optional[float]:
+    """Seconds since a pandas bar timestamp (naive ones taken as UTC); None if it is not a timestamp."""
+    if not hasattr(timestamp, "timestamp"):
+        return None
+    return max(0.0, time.time() - timestamp.timestamp())
@@ -0,0 +1,504 @@
+"""
+Price providers for the pricing library.
+
+A provider turns holdings into prices from one source. It names the symbol it
+uses for each holding (also the cache key), the currency its prices are quoted
+in, and fetches prices for many symbols at once. The resolver decides which
+providers are tried for each holding, and in what order.
+"""
+
+import json
+import os
+import re
+import time
+import numpy as np
+import requests
+import yfinance as yf
+from concurrent.futures import Executor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from . import metrics
+from .limits import Deadline, ProviderLimit, request_timeout
+
+USD_BRL_SYMBOL = "BRL=X"
+BATCH_SIZE = 50
+
+# Yahoo exchange suffix for listings quoted in each currency. EUR is left out
+# since it spans several exchanges; give those tickers their suffix in
+# portfolio.json (e.g. "ASML.AS").
+EXCHANGE_SUFFIXES = {
+    "BRL": ".SA",
+    "CHF": ".SW",
+    "SGD": ".SI",
+    "TWD": ".TW",
+}
+
+TESOURO_URL = "https://tesouro.gabrielgaspar.com.br/bonds"
+TESOURO_SNAPSHOT_PATH = os.path.expanduser("~/.cache/portfolio-prices/tesouro_bonds.json")
+
+# (index, pays_coupon, maturity_year), e.g. ("ipca+", False, 2045)
+BondKey = Tuple[str, bool, int]
+BOND_NAME_RE = re.compile(r"Tesouro\s+(\S+)(.*)", re.IGNORECASE)
+
+CRYPTO_MAP = {
+    "BTC": "BTC-USD",
+    "ETH": "ETH-USD",
+    "AVAX": "AVAX-USD"
+}
+
+
+def crypto_symbol(ticker: str) -> str:
+    """Translate a crypto ticker to its Yahoo USD pair."""
+    return CRYPTO_MAP.get(ticker, f"{ticker}-USD")
+
+
+def stock_symbol(ticker: str, local_currency: str) -> str:
+    """Non-US listings need their exchange suffix on Yahoo, e.g. .SA for B3."""
+    if "." in ticker:
+        return ticker
+    return ticker + EXCHANGE_SUFFIXES.get(local_currency, "")
+
+
+def get_quote_chunk(chunk: List[str]) -> Dict[str, float]:
+    """
+    Fetch the latest close for one group of Yahoo symbols in a single download.
+
+    Raises when the download fails or comes back empty, so the provider's
+    limit can retry it.
+    """
+    with metrics.call("yfinance", "quote_chunk", chunk) as call:
+        try:
+            data = yf.download(chunk, period="1d", progress=False, threads=False, timeout=request_timeout())
+            if data is None or data.empty:
+                raise ValueError("empty download")
+        except Exception as e:
+            print(f"Error fetching batch of {len(chunk)} quotes: {e}")
+            raise
+        closes = data['Close']
+        if not hasattr(closes, 'columns'):
+            closes = closes.to_frame(name=chunk[0])
+        prices = {}
+        for symbol in closes.columns:
+            # Crypto trades on days the exchanges are closed, so take each
+            # column's own last close rather than the last row of the frame.
+            column = closes[symbol].dropna()
+            if not column.empty:
+                prices[symbol] = float(column.iloc[-1])
+                call.observe_age(metrics.bar_age(column.index[-1]))
+        call.result(len(prices))
+        return prices
+
+
+def get_batch_prices(symbols: Iterable[str], pool: Optional[Executor] = None,
+                     limit: Optional[ProviderLimit] = None, deadline: Optional[Deadline] = None
+                     ) -> Dict[str, float]:
+    """
+    Fetch the latest close for many Yahoo symbols with grouped bulk downloads.
+
+    Groups run concurrently on `pool` when given, each throttled and retried
+    by `limit` until `deadline`. A group that still fails is left out.
+    Symbols missing from the result should be retried one by one by the caller.
+    """
+    unique = sorted(set(symbols))
+    chunks = [unique[start:start + BATCH_SIZE] for start in range(0, len(unique), BATCH_SIZE)]
+
+    def fetch(chunk: List[str]) -> Dict[str, float]:
+        try:
+            return limit.call(get_quote_chunk, chunk, deadline=deadline) if limit else get_quote_chunk(chunk)
+        except Exception:
+            return {}
+
+    results = pool.map(fetch, chunks) if pool else map(fetch, chunks)
+    prices = {}
+    for result in results:
+        prices.update(result)
+    return prices
+
+
+def get_close_history(symbols: List[str], start: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Daily closes of many Yahoo symbols since `start` (YYYY-MM-DD) in one bulk download.
+
+    Returns (dates, closes): a datetime64[D] array and a days × symbols
+    matrix in `symbols` order, NaN where a symbol has no close that day.
+    """
+    data = yf.download(symbols, start=start, interval="1d", progress=False, threads=True)
+    if data is None or data.empty:
+        return np.zeros(0, dtype="datetime64[D]"), np.zeros((0, len(symbols)))
+    closes = data['Close']
+    if not hasattr(closes, 'columns'):
+        closes = closes.to_frame(name=symbols[0])
+    closes = closes.reindex(columns=symbols)
+    dates = np.array(closes.index.date, dtype="datetime64[D]")
+    return dates, closes.to_numpy(dtype=np.float64)
+
+
+def _last_close(data, call: metrics.Call) -> float:
+    call.observe_age(metrics.bar_age(data.index[-1]))
+    return float(data['Close'].iloc[-1])
+
+
+def get_usd_brl_rate() -> float:
+    """Fetch the current USD/BRL exchange rate."""
+    with metrics.call("yfinance", "usd_brl_rate", [USD_BRL_SYMBOL]) as call:
+        try:
+            ticker = yf.Ticker("BRL=X")
+            data = ticker.history(period="1d", timeout=request_timeout())
+            if not data.empty:
+                return _last_close(data, call)
+            else:
+                call.fallback_step = 1
+                ticker = yf.Ticker("USDBRL=X")
+                data = ticker.history(period="1d", timeout=request_timeout())
+                if not data.empty:
+                    return _last_close(data, call)
+                else:
+                    raise ValueError("Unable to fetch BRL exchange rate")
+        except Exception as e:
+            print(f"Error fetching USD/BRL rate: {e}")
+            raise
+
+
+def get_fx_rate(currency: str) -> Optional[float]:
+    """Fetch the current rate in units of `currency` per USD; None if Yahoo has no quote, raises on errors."""
+    if currency == "BRL":
+        return get_usd_brl_rate()
+    with metrics.call("yfinance", "fx_rate", [f"{currency}=X"]) as call:
+        try:
+            for step, symbol in enumerate((f"{currency}=X", f"USD{currency}=X")):
+                call.fallback_step = step
+                data = yf.Ticker(symbol).history(period="1d", timeout=request_timeout())
+                if not data.empty:
+                    return _last_close(data, call)
+            call.outcome = "empty"
+            return None
+        except Exception as e:
+            print(f"Error fetching USD/{currency} rate: {e}")
+            raise
+
+
+def parse_bond_name(name: str) -> Optional[BondKey]:
+    """
+    Parse a Tesouro bond name into (index, pays_coupon, maturity_year).
+
+    Handles both API names ("Tesouro IPCA+ com Juros Semestrais 2030") and the
+    short portfolio form ("Tesouro IPCA+ c/ Juros 2030"); both give
+    ("ipca+", True, 2030).
+    """
+    match = BOND_NAME_RE.search(name or "")
+    if not match:
+        return None
+    index, rest = match.groups()
+    year = re.search(r"\b(20\d{2})\b", rest)
+    if not year:
+        return None
+    return index.lower(), "juros" in rest.lower(), int(year.group(1))
+
+
+def build_bond_index(data) -> Dict[BondKey, float]:
+    """Index an API /bonds payload by parsed bond name."""
+    bonds = data.get('bonds', data) if isinstance(data, dict) else data
+    index = {}
+    for bond in bonds:
+        key = parse_bond_name(bond.get('name', '') or bond.get('bond_name', ''))
+        # The API may return different field names, try common ones
+        bond_price = (
+            bond.get('unitary_redemption_value') or
+            bond.get('price') or
+            bond.get('pu') or
+            bond.get('unit_price')
+        )
+        if key is None or bond_price is None:
+            continue
+        index[key] = float(bond_price)
+    return index
+
+
+def get_tesouro_index(snapshot_path: Optional[str] = None) -> Dict[BondKey, float]:
+    """
+    Fetch the Tesouro API bond list as a parsed index.
+
+    The last response is kept on disk with its ETag/Last-Modified validators,
+    so an unchanged list costs a 304 and no parsing.
+    """
+    snapshot_path = snapshot_path or TESOURO_SNAPSHOT_PATH
+    snapshot = {}
+    if os.path.exists(snapshot_path):
+        try:
+            with open(snapshot_path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            snapshot = {}
+
+    headers = {}
+    if snapshot.get('etag'):
+        headers['If-None-Match'] = snapshot['etag']
+    if snapshot.get('last_modified'):
+        headers['If-Modified-Since'] = snapshot['last_modified']
+
+    response = requests.get(TESOURO_URL, headers=headers, timeout=request_timeout())
+    if response.status_code == 304 and 'bonds' in snapshot:
+        return {(index, coupon, year): price for index, coupon, year, price in snapshot['bonds']}
+    response.raise_for_status()
+
+    index = build_bond_index(response.json())
+    snapshot = {
+        "etag": response.headers.get('ETag'),
+        "last_modified": response.headers.get('Last-Modified'),
+        "bonds": [[*key, price] for key, price in index.items()],
+    }
+    os.makedirs(os.path.dirname(snapshot_path), exist_ok=True)
+    with open(snapshot_path, 'w') as f:
+        json.dump(snapshot, f)
+    return index
+
+
+def get_tesouro_prices(names: Iterable[str]) -> Dict[str, float]:
+    """
+    Fetch Tesouro Direto prices from Gabriel Gaspar's free API.
+
+    Returns {name: unit price} for each portfolio bond name found in the API.
+    Raises when the API cannot be reached or its answer cannot be read.
+    """
+    names = list(names)
+    with metrics.call("tesouro", "bonds", names) as call:
+        try:
+            index = get_tesouro_index()
+        except requests.exceptions.RequestException as e:
+            print(f"Warning: Could not fetch Tesouro prices from API: {e}")
+            raise
+        except Exception as e:
+            print(f"Warning: Error processing Tesouro prices: {e}")
+            raise
+        prices = {}
+        for name in names:
+            key = parse_bond_name(name)
+            if key in index:
+                prices[name] = index[key]
+        call.result(len(prices))
+        return prices
+
+
+def get_crypto_price(ticker: str) -> Optional[float]:
+    """Fetch cryptocurrency price in USD; None if Yahoo has no quote, raises on errors."""
+    with metrics.call("yfinance", "crypto_price", [crypto_symbol(ticker)]) as call:
+        try:
+            crypto = yf.Ticker(crypto_symbol(ticker))
+            data = crypto.history(period="1d", timeout=request_timeout())
+        except Exception as e:
+            print(f"Error fetching crypto price for {ticker}: {e}")
+            raise
+        if not data.empty:
+            return _last_close(data, call)
+        call.outcome = "empty"
+        return None
+
+
+def get_stock_price(ticker: str, local_currency: str, asset_type: str) -> Optional[float]:
+    """Fetch stock price in the specified currency; None if Yahoo has no quote, raises on errors."""
+    if asset_type == "Fixed Income" and local_currency == "BRL" and "Tesouro" in ticker:
+        return None
+    with metrics.call("yfinance", "stock_price", [stock_symbol(ticker, local_currency)]) as call:
+        try:
+            stock = yf.Ticker(stock_symbol(ticker, local_currency))
+            data = stock.history(period="1d", timeout=request_timeout())
+        except Exception as e:
+            print(f"Error fetching stock price for {ticker}: {e}")
+            raise
+        if not data.empty:
+            return _last_close(data, call)
+        call.outcome = "empty"
+        return None
+
+
+class PriceProvider:
+    """Base class for a source of holding prices."""
+
+    name = "provider"
+    # Whether fetched prices go through the on-disk price cache
+    cacheable = True
+
+    def __init__(self, limit: Optional[ProviderLimit] = None):
+        self.limit = limit
+        # Set by resolve_prices for the duration of a deadline-bounded run
+        self.deadline: Optional[Deadline] = None
+
+    def call(self, func, *args):
+        """Run one network call under this provider's rate limit, retried until the run's deadline."""
+        return self.limit.call(func, *args, deadline=self.deadline) if self.limit else func(*args)
+
+    def try_call(self, func, *args):
+        """Like call(), but a call that still fails after its retries returns None."""
+        try:
+            return self.call(func, *args)
+        except Exception:
+            return None
+
+    def symbol(self, holding: Dict) -> Optional[str]:
+        """Key this provider prices `holding` under, or None if it cannot."""
+        return holding['ticker'] or None
+
+    def currency(self, holding: Dict) -> str:
+        """Currency of the prices this provider returns for `holding`."""
+        return holding['localCurrency']
+
+    def fetch(self, wanted: Dict[str, Dict], pool: Optional[Executor] = None) -> Dict[str, float]:
+        """Return {symbol: price} for the symbols in `wanted` ({symbol: holding}) it could price."""
+        raise NotImplementedError
+
+
+class YahooProvider(PriceProvider):
+    """Stocks, ETFs, FIIs, REITs, crypto and FX from yfinance, batched."""
+
+    name = "yfinance"
+
+    def __init__(self, limit: Optional[ProviderLimit] = None):
+        super().__init__(limit or ProviderLimit(self.name, max_concurrency=4, rate=4.0, burst=4))
+
+    def symbol(self, holding: Dict) -> Optional[str]:
+        ticker = holding['ticker']
+        if not ticker:
+            return None
+        if holding['type'] == "FX":
+            return ticker
+        if holding['type'] == "Crypto":
+            return crypto_symbol(ticker)
+        return stock_symbol(ticker, holding['localCurrency'])
+
+    def currency(self, holding: Dict) -> str:
+        # Crypto pairs are quoted in USD whatever the holding's local currency
+        return "USD" if holding['type'] == "Crypto" else holding['localCurrency']
+
+    def fetch(self, wanted: Dict[str, Dict], pool: Optional[Executor] = None) -> Dict[str, float]:
+        print(f"Fetching {len(wanted)} quotes in batch...")
+        prices = get_batch_prices(wanted, pool, self.limit, self.deadline)
+        print(f"  Retrieved {len(prices)} quotes")
+
+        missing = [symbol for symbol in wanted if symbol not in prices]
+        fetch_one = lambda symbol: self.try_call(self.fetch_one, wanted[symbol])
+        singles = pool.map(fetch_one, missing) if pool else map(fetch_one, missing)
+        for symbol, price in zip(missing, singles):
+            if price:
+                prices[symbol] = price
+        return prices
+
+    def fetch_one(self, holding: Dict) -> Optional[float]:
+        """Request one holding's quote on its own."""
+        if holding['type'] == "FX":
+            return get_fx_rate(holding['localCurrency'])
+        if holding['type'] == "Crypto":
+            return get_crypto_price(holding['ticker'])
+        return get_stock_price(holding['ticker'], holding['localCurrency'], holding['type'])
+
+
+class TesouroProvider(PriceProvider):
+    """Any Tesouro Direto bond from the Tesouro API, matched by parsed bond name."""
+
+    name = "tesouro"
+
+    def __init__(self, limit: Optional[ProviderLimit] = None):
+        super().__init__(limit or ProviderLimit(self.name, max_concurrency=1, rate=1.0, burst=1))
+
+    def currency(self, holding: Dict) -> str:
+        return "BRL"
+
+    def fetch(self, wanted: Dict[str, Dict], pool: Optional[Executor] = None) -> Dict[str, float]:
+        print("Fetching Tesouro Direto prices...")
+        bonds = self.try_call(get_tesouro_prices, list(wanted)) or {}
+        if bonds:
+            print(f"  Retrieved prices for {len(bonds)} Tesouro bonds")
+        else:
+            print("  No Tesouro prices available (using costBasis fallback)")
+        return bonds
+
+
+class CostBasisProvider(PriceProvider):
+    """Unit price implied by a holding's BRL costBasis; no network access."""
+
+    name = "costBasis"
+    cacheable = False
+
+    def currency(self, holding: Dict) -> str:
+        return "BRL"
+
+    def fetch(self, wanted: Dict[str, Dict], pool: Optional[Executor] = None) -> Dict[str, float]:
+        prices = {}
+        for symbol, holding in wanted.items():
+            cost_basis = holding.get('costBasis')
+            if cost_basis and holding['quantity'] > 0:
+                prices[symbol] = cost_basis / holding['quantity']
+        return prices
+
+
+class StubProvider(PriceProvider):
+    """In-memory prices keyed by ticker, for tests and offline runs. Records every fetch."""
+
+    cacheable = False
+
+    def __init__(self, prices: Dict[str, float], name: str = "stub", currency: Optional[str] = None):
+        super().__init__()
+        self.name = name
+        self.prices = dict(prices)
+        self.quote_currency = currency
+        self.calls: List[List[str]] = []
+
+    def currency(self, holding: Dict) -> str:
+        return self.quote_currency or holding['localCurrency']
+
+    def fetch(self, wanted: Dict[str, Dict], pool: Optional[Executor] = None) -> Dict[str, float]:
+        self.calls.append(sorted(wanted))
+        return {symbol: self.prices[symbol] for symbol in wanted if symbol in self.prices}
+
+
+class LastKnownProvider(PriceProvider):
+    """
+    Last good price of holdings nothing else could price in time.
+
+    Looks in the price cache, at any age, under each provider of the
+    holding's chain, then in the price history. Remembers when each price was
+    originally fetched so the valuation can report its age. Never cached, so
+    an old price is never stored again as a fresh one.
+    """
+
+    name = "last_known"
+    cacheable = False
+
+    def __init__(self, resolver, cache=None, history=None):
+        super().__init__()
+        self.resolver = resolver
+        self.cache = cache
+        self.history = history
+        self.quoted: Dict[str, str] = {}
+        self.fetched_at: Dict[str, float] = {}
+
+    def currency(self, holding: Dict) -> str:
+        return self.quoted.get(self.symbol(holding), holding['localCurrency'])
+
+    def age(self, holding: Dict, now: Optional[float] = None) -> Optional[float]:
+        """Seconds since the price served for `holding` was fetched."""
+        fetched_at = self.fetched_at.get(self.symbol(holding))
+        if fetched_at is None:
+            return None
+        return max(0.0, (time.time() if now is None else now) - fetched_at)
+
+    def fetch(self, wanted: Dict[str, Dict], pool: Optional[Executor] = None) -> Dict[str, float]:
+        prices = {}
+        for symbol, holding in wanted.items():
+            for provider in self.resolver.route(holding):
+                key = provider.symbol(holding)
+                if not (self.cache and provider.cacheable and key):
+                    continue
+                hit = self.cache.last_known(provider.name, [key]).get(key)
+                if hit:
+                    prices[symbol] = hit[0]
+                    self.quoted[symbol] = provider.currency(holding)
+                    self.fetched_at[symbol] = hit[1]
+                    break
+        # The history holds holding prices in their local currency, and no FX rates
+        rest = [symbol for symbol, holding in wanted.items() if symbol not in prices and holding['type'] != "FX"]
+        if self.history and rest:
+            for symbol, (price, fetched_at) in self.history.last_prices(rest).items():
+                prices[symbol] = price
+                self.quoted[symbol] = wanted[symbol]['localCurrency']
+                self.fetched_at[symbol] = fetched_at
+        return prices
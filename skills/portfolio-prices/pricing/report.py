@@ -0,0 +1,135 @@
+"""
+Portfolio summary report for the hourly price update.
+
+Holdings are loaded into column arrays, categories are looked up in a table
+built once from the rules below, and category totals are a single weighted
+bincount. Holdings without a price count as
+missing rather than breaking the sums.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .history import PriceHistory
+
+# The rules are tried in this order, as the hourly report always has; the first match wins.
+# Types whose category wins over everything else
+PRIMARY_TYPE_CATEGORIES = {
+    "Crypto": "Crypto",
+    "Gold": "Gold",
+}
+# Tickers whose category does not follow from type and currency
+TICKER_CATEGORIES = {
+    "BIL": "Cash/T-Bills",
+    "TFLO": "Cash/T-Bills",
+}
+# Asset names containing this are Tesouro bonds, whatever their type
+TESOURO_MARKER = "Tesouro"
+TYPE_CATEGORIES = {
+    "FII": "FIIs",
+    "REITS": "US REITs",
+}
+CURRENCY_CATEGORIES = {
+    "USD": "US Stocks",
+}
+# Everything else, in any other currency
+DEFAULT_CATEGORY = "BR Stocks"
+
+# Holding types and currencies portfolio.json uses (references/schemas.md)
+HOLDING_TYPES = ("Stocks", "Crypto", "Fixed Income", "FII", "REITS", "Gold")
+CURRENCIES = ("BRL", "USD")
+
+# Only report moves larger than this, in percent
+MOVER_THRESHOLD = 0.3
+TOP_MOVERS = 3
+
+
+def type_currency_category(asset_type: str, local_currency: str) -> str:
+    """Category from type and currency alone, before ticker and Tesouro overrides."""
+    if asset_type in PRIMARY_TYPE_CATEGORIES:
+        return PRIMARY_TYPE_CATEGORIES[asset_type]
+    if asset_type in TYPE_CATEGORIES:
+        return TYPE_CATEGORIES[asset_type]
+    return CURRENCY_CATEGORIES.get(local_currency, DEFAULT_CATEGORY)
+
+
+CATEGORY_TABLE = {(asset_type, currency): type_currency_category(asset_type, currency)
+                  for asset_type in HOLDING_TYPES for currency in CURRENCIES}
+
+
+def holdings_frame(prices: Dict) -> Dict[str, np.ndarray]:
+    """Column arrays for the holdings of a fetch_all_prices result; missing prices are NaN."""
+    holdings = prices['holdings']
+
+    def numeric(field: str) -> np.ndarray:
+        return np.array([np.nan if h[field] is None else h[field] for h in holdings], dtype=np.float64)
+
+    return {
+        "ticker": np.array([str(h['ticker']) for h in holdings]),
+        "asset": np.array([str(h['asset']) for h in holdings]),
+        "type": np.array([h['type'] for h in holdings]),
+        "local_currency": np.array([h['local_currency'] for h in holdings]),
+        "price_local": numeric('price_local'),
+        "value_usd": numeric('value_usd'),
+    }
+
+
+def categorize(frame: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """Return (category names, per-holding category code)."""
+    categories = np.array([CATEGORY_TABLE.get(key) or type_currency_category(*key)
+                           for key in zip(frame["type"], frame["local_currency"])], dtype=object)
+    # Primary types keep their category; otherwise a ticker override beats the Tesouro marker
+    overridable = ~np.isin(frame["type"], list(PRIMARY_TYPE_CATEGORIES))
+    categories[overridable & (np.char.find(frame["asset"], TESOURO_MARKER) >= 0)] = "Tesouro"
+    for ticker, category in TICKER_CATEGORIES.items():
+        categories[overridable & (frame["ticker"] == ticker)] = category
+    names, codes = np.unique(categories.astype(str), return_inverse=True)
+    return names, codes
+
+
+def category_totals(frame: Dict[str, np.ndarray]) -> List[Tuple[str, float, float]]:
+    """(category, value_usd, % of total) sorted by value, largest first."""
+    names, codes = categorize(frame)
+    values = np.nan_to_num(frame["value_usd"], nan=0.0)
+    totals = np.bincount(codes, weights=values, minlength=len(names))
+    total = totals.sum()
+    pct = totals / total * 100 if total > 0 else np.zeros_like(totals)
+    order = np.argsort(-totals, kind="stable")
+    return [(str(names[i]), float(totals[i]), float(pct[i])) for i in order]
+
+
+def build_report(prices: Dict, history: Optional[PriceHistory] = None) -> str:
+    """Text of the 'Prices Updated' message; movers come from `history`, and are left out without one."""
+    frame = holdings_frame(prices)
+    total = float(np.nansum(frame["value_usd"]))
+    priced = int(np.isfinite(frame["value_usd"]).sum())
+    usd_brl = prices['usd_brl_rate']
+
+    message = "Prices Updated ✓\n\n"
+    message += f"Total: ${total:,.0f} USD (USD/BRL: {usd_brl:.2f})\n"
+    if priced < len(frame["ticker"]):
+        message += f"Priced {priced}/{len(frame['ticker'])} holdings\n"
+    ages = [h['price_age'] for h in prices['holdings'] if h.get('stale')]
+    ages += list(prices.get('stale_rates', {}).values())
+    if ages:
+        message += f"⚠️ {len(ages)} last known price(s), oldest {max(ages) / 3600:.1f}h\n"
+    message += "\n"
+    message += "| Category         | Value     | %  |\n"
+    message += "| --------------- | --------- | -- |\n"
+    for category, value, pct in category_totals(frame):
+        message += f"| {category:<18} | ${value:>8,.0f} | {int(pct):>2}% |\n"
+
+    movers = history.movers("last", threshold=MOVER_THRESHOLD)[:TOP_MOVERS] if history else []
+    if len(movers):
+        currencies = dict(zip(frame["ticker"], frame["local_currency"]))
+        message += "\nMovers since last update:\n\n"
+        for mover in movers:
+            ticker = mover['ticker'].decode()
+            prev, curr, pct = mover['prev'], mover['curr'], mover['pct']
+            if currencies.get(ticker) == 'BRL':
+                message += f"• {ticker}: R${prev:.2f} → R${curr:.2f} ({pct:+.1f}%)\n"
+            else:
+                message += f"• {ticker}: ${prev:,.0f} → ${curr:,.0f} ({pct:+.1f}%)\n"
+
+    return message
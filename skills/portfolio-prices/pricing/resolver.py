@@ -0,0 +1,58 @@
+"""Routing of holdings to the price providers that can value them."""
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .providers import CostBasisProvider, PriceProvider, TesouroProvider, YahooProvider
+
+# (type, localCurrency) -> providers; a None currency matches any currency
+Routes = Dict[Tuple[str, Optional[str]], List[PriceProvider]]
+# Route key -> test a holding must also pass for that route to apply
+Conditions = Dict[Tuple[str, Optional[str]], Callable[[Dict], bool]]
+
+
+def is_tesouro(holding: Dict) -> bool:
+    """Tesouro Direto bonds carry "Tesouro" in their ticker; other BRL fixed income (CDB, LCI) does not."""
+    return "Tesouro" in str(holding['ticker'])
+
+
+class Resolver:
+    """Picks an ordered chain of providers for each holding by `type` and `localCurrency`."""
+
+    def __init__(self, routes: Routes, default: List[PriceProvider], fx: PriceProvider,
+                 conditions: Optional[Conditions] = None):
+        self.routes = routes
+        self.default = default
+        self.fx = fx
+        self.conditions = conditions or {}
+
+    def _matches(self, key: Tuple[str, Optional[str]], holding: Dict) -> bool:
+        return key in self.routes and self.conditions.get(key, lambda _: True)(holding)
+
+    def route(self, holding: Dict) -> List[PriceProvider]:
+        """Providers to try for `holding`, first choice first."""
+        if holding['type'] == "FX":
+            return [self.fx]
+        for key in ((holding['type'], holding['localCurrency']), (holding['type'], None)):
+            if self._matches(key, holding):
+                return self.routes[key]
+        return self.default
+
+    def providers(self) -> List[PriceProvider]:
+        """Every distinct provider this resolver can route to."""
+        seen = []
+        for chain in [[self.fx], self.default, *self.routes.values()]:
+            for provider in chain:
+                if provider not in seen:
+                    seen.append(provider)
+        return seen
+
+
+def default_resolver() -> Resolver:
+    """Yahoo for everything except Tesouro Direto bonds, which are Tesouro with a costBasis fallback."""
+    yahoo = YahooProvider()
+    return Resolver(
+        routes={("Fixed Income", "BRL"): [TesouroProvider(), CostBasisProvider()]},
+        default=[yahoo],
+        fx=yahoo,
+        conditions={("Fixed Income", "BRL"): is_tesouro},
+    )
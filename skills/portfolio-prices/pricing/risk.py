@@ -0,0 +1,393 @@
+"""
+Portfolio risk from daily closes.
+
+Every Yahoo-priced holding, and the USD rate of every currency they are quoted
+in, is downloaded in one bulk request. Closes are aligned on weekdays (crypto
+weekend moves fold into Monday), forward-filled over market holidays and
+converted into the reporting currency, giving a days × assets returns matrix.
+Covariance, per-asset and portfolio volatility, the techExposed share of value
+and of risk, drawdown and historical VaR are array operations on that matrix.
+
+The rolling window is saved between runs together with running sums of its
+returns and of their cross products. A later run downloads only the days
+since the last one, adds their returns to the sums and subtracts the returns
+that left the window, so the covariance is updated instead of rebuilt.
+
+Usage:
+    python risk.py [--window DAYS] [--currency USD|BRL] [--full] [--json]
+"""
+
+import argparse
+import json
+import os
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from . import providers
+from .engine import PORTFOLIO_PATH
+from .fx import BASE_CURRENCY, fx_symbol
+from .resolver import Resolver, default_resolver
+
+STATE_DIR = os.path.expanduser("~/.cache/portfolio-prices")
+
+TRADING_DAYS = 252
+WINDOW = 252
+# An asset needs this many days of history to enter the returns matrix
+MIN_DAYS = 20
+CONFIDENCE = (0.95, 0.99)
+TOP_CONTRIBUTORS = 5
+
+# (symbols, start) -> (dates, closes); providers.get_close_history unless replaced
+Downloader = Callable[[List[str], str], Tuple[np.ndarray, np.ndarray]]
+
+
+def state_path(currency: str) -> str:
+    return os.path.join(STATE_DIR, f"risk_{currency.lower()}.npz")
+
+
+def weekday(dates: np.ndarray) -> np.ndarray:
+    """Day of the week of datetime64[D] dates, Monday = 0 (1970-01-01 was a Thursday)."""
+    return (dates.astype("datetime64[D]").astype(np.int64) + 3) % 7
+
+
+def forward_fill(closes: np.ndarray, seed: Optional[np.ndarray] = None) -> np.ndarray:
+    """Carry each column's last close over the days it has none, starting from `seed` when given."""
+    if seed is not None:
+        closes = np.vstack([seed, closes])
+    rows = np.where(np.isfinite(closes), np.arange(len(closes))[:, np.newaxis], 0)
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    filled = closes[rows, np.arange(closes.shape[1])]
+    return filled[1:] if seed is not None else filled
+
+
+def completed_days(dates: np.ndarray, closes: np.ndarray, today: date) -> Tuple[np.ndarray, np.ndarray]:
+    """Rows for days before `today`; today's closes are still moving."""
+    keep = dates < np.datetime64(today)
+    return dates[keep], closes[keep]
+
+
+def covered_holdings(holdings: List[Dict], resolver: Resolver) -> List[Tuple[int, str, str]]:
+    """(index, Yahoo symbol, quote currency) of every holding Yahoo prices first."""
+    covered = []
+    for index, holding in enumerate(holdings):
+        provider = resolver.route(holding)[0]
+        if not isinstance(provider, providers.YahooProvider) or holding['quantity'] <= 0:
+            continue
+        symbol = provider.symbol(holding)
+        if symbol:
+            covered.append((index, symbol, provider.currency(holding)))
+    return covered
+
+
+class RollingWindow:
+    """
+    The last `size` daily returns of a set of assets in one currency.
+
+    Alongside the returns it keeps their column sums and cross-product matrix,
+    which push() updates for the rows entering and leaving the window, and the
+    last aligned closes (assets, then FX pairs) that the next day's returns
+    are computed from.
+    """
+
+    def __init__(self, symbols: Sequence[str], quoted: Sequence[str], currency: str, size: int = WINDOW):
+        self.symbols = list(symbols)
+        self.quoted = list(quoted)
+        self.currency = currency
+        self.size = size
+        self.requested: List[str] = list(symbols)
+        self.dates = np.zeros(0, dtype="datetime64[D]")
+        self.returns = np.zeros((0, len(self.symbols)))
+        self.sums = np.zeros(len(self.symbols))
+        self.cross = np.zeros((len(self.symbols), len(self.symbols)))
+        self.last_closes: Optional[np.ndarray] = None
+        self.last_date: Optional[np.datetime64] = None
+
+    @property
+    def fx_currencies(self) -> List[str]:
+        """Currencies whose USD rate the conversion needs, in column order after the assets."""
+        currencies = set(self.quoted) | {self.currency}
+        currencies.discard(BASE_CURRENCY)
+        return sorted(currencies)
+
+    @property
+    def columns(self) -> List[str]:
+        return [*self.symbols, *map(fx_symbol, self.fx_currencies)]
+
+    def to_currency(self, closes: np.ndarray) -> np.ndarray:
+        """Asset closes converted into the window currency by that day's FX rates."""
+        count = len(self.symbols)
+        per_usd = dict(zip(self.fx_currencies, closes[:, count:].T))
+        ones = np.ones(len(closes))
+        quoted = np.column_stack([per_usd.get(c, ones) for c in self.quoted]) if count else closes[:, :0]
+        target = per_usd.get(self.currency, ones)
+        return closes[:, :count] / quoted * target[:, np.newaxis]
+
+    def push(self, dates: np.ndarray, returns: np.ndarray) -> None:
+        """Add returns for new days and drop the oldest ones beyond the window size."""
+        self.sums += returns.sum(axis=0)
+        self.cross += returns.T @ returns
+        self.dates = np.concatenate([self.dates, dates])
+        self.returns = np.vstack([self.returns, returns])
+        extra = len(self.returns) - self.size
+        if extra > 0:
+            dropped = self.returns[:extra]
+            self.sums -= dropped.sum(axis=0)
+            self.cross -= dropped.T @ dropped
+            self.dates, self.returns = self.dates[extra:], self.returns[extra:]
+
+    def advance(self, dates: np.ndarray, closes: np.ndarray) -> int:
+        """
+        Extend the window with downloaded closes (in `columns` order); returns new days added.
+
+        Only weekdays after the last one already held are used. Gaps are
+        filled from the previous close, so an asset that did not trade on a
+        day has a zero return that day. The caller leaves out the current
+        day, whose closes are not final yet.
+        """
+        filled = forward_fill(closes, self.last_closes)
+        keep = weekday(dates) < 5
+        if self.last_date is not None:
+            keep &= dates > self.last_date
+        dates, filled = dates[keep], filled[keep]
+        if not len(dates):
+            return 0
+        prices = self.to_currency(filled)
+        if self.last_closes is not None:
+            prices = np.vstack([self.to_currency(self.last_closes[np.newaxis, :]), prices])
+            added = dates
+        else:
+            added = dates[1:]
+        self.push(added, prices[1:] / prices[:-1] - 1)
+        self.last_closes, self.last_date = filled[-1], dates[-1]
+        return len(added)
+
+    def covariance(self) -> np.ndarray:
+        """Sample covariance of daily returns, from the running sums."""
+        n = len(self.returns)
+        mean = self.sums / n
+        return (self.cross - n * np.outer(mean, mean)) / (n - 1)
+
+    def last_prices(self) -> np.ndarray:
+        return self.to_currency(self.last_closes[np.newaxis, :])[0]
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, symbols=np.array(self.symbols), quoted=np.array(self.quoted),
+                     requested=np.array(self.requested), currency=self.currency, size=self.size,
+                     dates=self.dates, returns=self.returns, sums=self.sums, cross=self.cross,
+                     last_closes=self.last_closes, last_date=self.last_date)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["RollingWindow"]:
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                window = cls(data["symbols"].tolist(), data["quoted"].tolist(), str(data["currency"]),
+                             int(data["size"]))
+                window.requested = data["requested"].tolist()
+                window.dates, window.returns = data["dates"], data["returns"]
+                window.sums, window.cross = data["sums"], data["cross"]
+                window.last_closes, window.last_date = data["last_closes"], data["last_date"][()]
+        except (OSError, KeyError, ValueError):
+            return None
+        return window
+
+
+def build_window(covered: List[Tuple[int, str, str]], currency: str, size: int,
+                 download: Downloader, today: date) -> RollingWindow:
+    """Download enough history for a full window and keep the assets that have it."""
+    symbols = list(dict.fromkeys(symbol for _, symbol, _ in covered))
+    quoted = [next(q for _, s, q in covered if s == symbol) for symbol in symbols]
+    window = RollingWindow(symbols, quoted, currency, size)
+    # Calendar days for `size` weekdays, plus room for holidays
+    start = today - timedelta(days=size * 7 // 5 + 15)
+    dates, closes = download(window.columns, start.isoformat())
+    dates, closes = completed_days(dates, closes, today)
+    if not len(dates):
+        raise ValueError("No price history downloaded")
+
+    fx = closes[:, len(symbols):]
+    missing = [c for c, column in zip(window.fx_currencies, fx.T) if not np.isfinite(column).any()]
+    if missing:
+        raise ValueError(f"No exchange rate history for {', '.join(missing)}")
+    weekdays = weekday(dates) < 5
+    seen = np.isfinite(closes) & weekdays[:, np.newaxis]
+    first = np.where(seen.any(axis=0), seen.argmax(axis=0), len(dates))
+    total = int(weekdays.sum())
+    enough = (total - weekdays.cumsum()[np.minimum(first, len(dates) - 1)]) >= MIN_DAYS
+    enough[len(symbols):] = True
+
+    trimmed = RollingWindow([s for s, ok in zip(symbols, enough) if ok],
+                            [q for q, ok in zip(quoted, enough) if ok], currency, size)
+    trimmed.requested = symbols
+    if not trimmed.symbols:
+        raise ValueError(f"No holding has {MIN_DAYS} days of price history")
+    columns = [i for i, ok in enumerate(enough) if ok]
+    # Start on the first weekday every kept column has a close for
+    filled = forward_fill(closes[:, columns])
+    begin = first[columns].max(initial=0)
+    trimmed.advance(dates[begin:], filled[begin:])
+    return trimmed
+
+
+def update_window(holdings: List[Dict], resolver: Optional[Resolver] = None, currency: str = BASE_CURRENCY,
+                  size: int = WINDOW, full: bool = False, download: Optional[Downloader] = None,
+                  path: Optional[str] = None, today: Optional[date] = None) -> Tuple[RollingWindow, int, bool]:
+    """
+    The saved rolling window brought up to date; returns (window, new days, rebuilt).
+
+    The window is rebuilt from a full download when there is none yet, when
+    the holdings, currency or window size changed, when `full` is set, or when
+    the last update is older than the window itself.
+    """
+    resolver = resolver or default_resolver()
+    download = download or providers.get_close_history
+    today = today or date.today()
+    path = path or state_path(currency)
+    covered = covered_holdings(holdings, resolver)
+    symbols = sorted(set(symbol for _, symbol, _ in covered))
+
+    window = None if full else RollingWindow.load(path)
+    stale = window is None or sorted(window.requested) != symbols or window.size != size
+    if not stale and np.datetime64(today) - window.last_date > np.timedelta64(size, "D"):
+        stale = True
+    if stale:
+        window = build_window(covered, currency, size, download, today)
+        added, rebuilt = len(window.returns), True
+    else:
+        dates, closes = download(window.columns, str(window.last_date + 1))
+        added, rebuilt = window.advance(*completed_days(dates, closes, today)), False
+    if len(window.returns) < 2:
+        raise ValueError("Not enough price history for risk figures")
+    window.save(path)
+    return window, added, rebuilt
+
+
+def correlation(cov: np.ndarray) -> np.ndarray:
+    scale = np.sqrt(np.diag(cov))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return cov / np.outer(scale, scale)
+
+
+def mean_correlation(corr: np.ndarray, mask: np.ndarray) -> float:
+    """Average pairwise correlation among the assets selected by `mask`."""
+    block = corr[np.ix_(mask, mask)]
+    pairs = block[~np.eye(len(block), dtype=bool)]
+    pairs = pairs[np.isfinite(pairs)]
+    return float(pairs.mean()) if len(pairs) else 0.0
+
+
+def risk_summary(window: RollingWindow, holdings: List[Dict], resolver: Optional[Resolver] = None,
+                 confidence: Sequence[float] = CONFIDENCE) -> Dict:
+    """
+    Risk figures for the current holdings over the window.
+
+    Weights are today's values of the covered holdings. Volatilities are
+    annualized; VaR and expected shortfall are one-day historical figures
+    for the current weights, in the window currency.
+    """
+    resolver = resolver or default_resolver()
+    covered = covered_holdings(holdings, resolver)
+    column = {symbol: i for i, symbol in enumerate(window.symbols)}
+    quantity = np.zeros(len(window.symbols))
+    tech = np.zeros(len(window.symbols), dtype=bool)
+    for index, symbol, _ in covered:
+        if symbol in column:
+            quantity[column[symbol]] += holdings[index]['quantity']
+            tech[column[symbol]] |= bool(holdings[index].get('techExposed'))
+
+    value = quantity * window.last_prices()
+    total = value.sum()
+    weights = value / total
+    cov = window.covariance()
+    marginal = cov @ weights
+    variance = float(weights @ marginal)
+    contribution = weights * marginal / variance
+    asset_vol = np.sqrt(np.diag(cov) * TRADING_DAYS)
+
+    daily = window.returns @ weights
+    growth = np.cumprod(1 + daily)
+    drawdown = growth / np.maximum.accumulate(np.maximum(growth, 1.0)) - 1
+    var = {}
+    for level in confidence:
+        cutoff = np.quantile(daily, 1 - level)
+        tail = daily[daily <= cutoff]
+        var[f"{level:.0%}"] = {"var": float(-cutoff * total), "var_pct": float(-cutoff * 100),
+                               "es": float(-tail.mean() * total), "es_pct": float(-tail.mean() * 100)}
+
+    corr = correlation(cov)
+    tech_weights = np.where(tech, weights, 0)
+    tech_variance = float(tech_weights @ cov @ tech_weights)
+    order = np.argsort(-contribution)[:TOP_CONTRIBUTORS]
+    return {
+        "currency": window.currency,
+        "start": str(window.dates[0]),
+        "end": str(window.dates[-1]),
+        "days": len(window.returns),
+        "covered": int(sum(1 for _, symbol, _ in covered if symbol in column)),
+        "holdings": len(holdings),
+        "value": float(total),
+        "volatility": float(np.sqrt(variance * TRADING_DAYS)),
+        "max_drawdown": float(drawdown.min()),
+        "var": var,
+        "tech": {
+            "value_share": float(tech_weights.sum()),
+            "risk_share": float(contribution[tech].sum()),
+            "volatility": float(np.sqrt(tech_variance * TRADING_DAYS) / tech_weights.sum()) if tech.any() else 0.0,
+            "correlation": mean_correlation(corr, tech),
+        },
+        "top_contributors": [
+            {"symbol": window.symbols[i], "weight": float(weights[i]), "risk_share": float(contribution[i]),
+             "volatility": float(asset_vol[i])}
+            for i in order
+        ],
+        "assets": {symbol: {"weight": float(w), "volatility": float(v)}
+                   for symbol, w, v in zip(window.symbols, weights, asset_vol)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Portfolio volatility, concentration and VaR from daily closes")
+    parser.add_argument("--portfolio", default=PORTFOLIO_PATH, help="Path to portfolio.json")
+    parser.add_argument("--window", type=int, default=WINDOW, help="Rolling window in trading days")
+    parser.add_argument("--currency", default=BASE_CURRENCY, help="Currency for returns and values (USD, BRL, ...)")
+    parser.add_argument("--full", action="store_true", help="Rebuild the window from a full download")
+    parser.add_argument("--json", action="store_true", help="Print the figures as JSON")
+    args = parser.parse_args()
+
+    with open(args.portfolio) as f:
+        holdings = json.load(f)['holdings']
+    currency = args.currency.upper()
+    try:
+        window, added, rebuilt = update_window(holdings, currency=currency, size=args.window, full=args.full)
+    except ValueError as e:
+        print(f"✗ {e}")
+        return 1
+    summary = risk_summary(window, holdings)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return 0
+
+    print(f"Risk over {summary['days']} trading days, {summary['start']} to {summary['end']} ({currency})")
+    print(f"  {'rebuilt from a full download' if rebuilt else f'{added} new day(s) added'}")
+    print(f"Covered: {summary['covered']}/{summary['holdings']} holdings, "
+          f"{summary['value']:,.2f} {currency} (holdings not on Yahoo, e.g. Tesouro, are left out)")
+    print(f"Volatility (annualized): {summary['volatility']:.1%}")
+    print(f"Max drawdown: {summary['max_drawdown']:.1%}")
+    for level, figures in summary['var'].items():
+        print(f"1-day VaR {level}: {figures['var']:,.2f} {currency} ({figures['var_pct']:.2f}%), "
+              f"ES {figures['es']:,.2f} ({figures['es_pct']:.2f}%)")
+    tech = summary['tech']
+    print(f"Tech-exposed: {tech['value_share']:.1%} of value, {tech['risk_share']:.1%} of risk, "
+          f"{tech['volatility']:.1%} volatility, {tech['correlation']:.2f} average correlation")
+    print("Top risk contributors:")
+    for row in summary['top_contributors']:
+        print(f"  {row['symbol']:<12} {row['weight']:>6.1%} of value  {row['risk_share']:>6.1%} of risk  "
+              f"vol {row['volatility']:.0%}")
+    return 0
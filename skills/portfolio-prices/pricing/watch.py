@@ -0,0 +1,216 @@
+"""
+Continuous portfolio pricing on a market calendar.
+
+Every holding, and every FX rate the valuation needs, is scheduled on its own:
+
+- crypto around the clock, FX from Sunday to Friday evening (New York);
+- exchange-listed assets while their exchange is in session, plus one fetch
+  of the settled close, skipping weekends and B3/NYSE holidays;
+- Tesouro bonds once per B3 trading day.
+
+Intervals adapt per item: an item whose price moved gets polled twice as
+often, down to its class minimum, and a quiet one backs off by half again,
+up to its class maximum. Only due items are fetched, batched per provider as
+in a normal run. The portfolio is revalued after every fetch. A new
+current_prices.json is written only when the total moved by at least the
+threshold.
+"""
+
+import json
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Sequence
+
+from .cache import CLOSE_SETTLE, TESOURO_TZ, PriceCache
+from .engine import resolve_prices, value_holdings
+from .fx import fx_holding, required_currencies
+from .history import PriceHistory
+from .markets import is_session_open, last_session_close, next_fx_open, next_session_open
+from .providers import PriceProvider
+from .resolver import Resolver, default_resolver
+
+# (minimum, initial, maximum) polling interval in seconds per schedule class
+WATCH_INTERVALS = {
+    "crypto": (30, 60, 900),
+    "fx": (60, 300, 1800),
+    "listed": (60, 300, 1800),
+}
+# Relative price change that counts as a move and shortens an item's interval
+MOVE_THRESHOLD = 0.002
+# Relative change of the portfolio total that triggers a new output
+EMIT_THRESHOLD = 0.001
+MAX_SLEEP = 3600
+
+
+@dataclass
+class WatchItem:
+    """One holding (or FX pseudo-holding) with its schedule and latest price."""
+
+    holding: Dict
+    kind: str
+    interval: float = 0.0
+    due: float = 0.0
+    price: Optional[float] = None
+    provider: Optional[PriceProvider] = None
+    fetched_at: float = 0.0
+    fetches: int = 0
+
+
+def schedule_class(holding: Dict, resolver: Resolver) -> str:
+    if holding['type'] == "Crypto":
+        return "crypto"
+    if holding['type'] == "FX":
+        return "fx"
+    if resolver.route(holding)[0].name == "tesouro":
+        return "daily"
+    return "listed"
+
+
+def next_due(item: WatchItem) -> float:
+    """When `item` should next be fetched, given its class, interval and last fetch."""
+    after = item.fetched_at + item.interval
+    if item.kind == "crypto":
+        return after
+    if item.kind == "fx":
+        return next_fx_open(after)
+    currency = item.holding['localCurrency']
+    if item.kind == "daily":
+        day = datetime.fromtimestamp(item.fetched_at, TESOURO_TZ).date() + timedelta(days=1)
+        midnight = datetime.combine(day, datetime.min.time(), tzinfo=TESOURO_TZ).timestamp()
+        return next_session_open("BRL", midnight)
+    if is_session_open(currency, after):
+        return after
+    # Closed: one more fetch once the official close has settled, then wait for the next open
+    settled = last_session_close(currency, after) + CLOSE_SETTLE
+    if item.fetched_at < settled:
+        return max(after, settled)
+    return next_session_open(currency, after)
+
+
+def adapt_interval(item: WatchItem, old_price: Optional[float]) -> None:
+    """Halve the interval after a move, stretch it by half while the price is quiet."""
+    low, initial, high = WATCH_INTERVALS.get(item.kind, (0, 0, 0))
+    if not item.interval:
+        item.interval = initial
+        return
+    if not old_price or not item.price:
+        return
+    change = abs(item.price - old_price) / old_price
+    if change >= MOVE_THRESHOLD:
+        item.interval = max(low, item.interval / 2)
+    elif change < MOVE_THRESHOLD / 4:
+        item.interval = min(high, item.interval * 1.5)
+
+
+class PriceWatcher:
+    """Keeps current_prices.json up to date, fetching each item only when its market makes it worth it."""
+
+    def __init__(self, portfolio_path: str, output_path: str, resolver: Optional[Resolver] = None,
+                 cache: Optional[PriceCache] = None, currencies: Sequence[str] = (),
+                 threshold: float = EMIT_THRESHOLD, history: Optional[PriceHistory] = None,
+                 clock: Callable[[], float] = time.time, sleep: Callable[[float], None] = time.sleep):
+        self.portfolio_path = portfolio_path
+        self.output_path = output_path
+        self.resolver = resolver or default_resolver()
+        self.cache = cache
+        self.currencies = list(currencies)
+        self.threshold = threshold
+        self.history = history
+        self.clock = clock
+        self.sleep = sleep
+        self.items: List[WatchItem] = []
+        self.holdings: List[Dict] = []
+        self.needed: List[str] = []
+        self.portfolio_mtime = 0.0
+        self.emitted_total: Optional[float] = None
+        self.fetches = 0
+        self.emits = 0
+
+    def load(self) -> None:
+        """(Re)read portfolio.json and price everything once, from the cache where fresh."""
+        self.portfolio_mtime = os.path.getmtime(self.portfolio_path)
+        with open(self.portfolio_path) as f:
+            self.holdings = json.load(f)['holdings']
+        self.needed = required_currencies(self.holdings, ["BRL", *self.currencies])
+        pseudo = [fx_holding(currency) for currency in self.needed]
+        self.items = [WatchItem(holding, schedule_class(holding, self.resolver))
+                      for holding in [*pseudo, *self.holdings]]
+        self.refresh(self.items, force=False)
+
+    def refresh(self, items: List[WatchItem], force: bool = True) -> None:
+        """Fetch `items` in one resolve pass and reschedule each of them."""
+        resolved = resolve_prices([item.holding for item in items], self.resolver, self.cache, force=force)
+        now = self.clock()
+        for item, (price, provider) in zip(items, resolved):
+            old_price = item.price
+            if price:
+                item.price, item.provider = price, provider
+            item.fetched_at = now
+            item.fetches += 1
+            adapt_interval(item, old_price)
+            item.due = next_due(item)
+        self.fetches += len(items)
+
+    def value(self) -> Dict:
+        count = len(self.needed)
+        pairs = [(item.price, item.provider) for item in self.items]
+        return value_holdings(self.holdings, pairs[count:], self.needed, pairs[:count], self.resolver,
+                              self.currencies, verbose=False)
+
+    def tick(self) -> Optional[Dict]:
+        """Fetch whatever is due; returns the valuation if it was emitted."""
+        if os.path.getmtime(self.portfolio_path) != self.portfolio_mtime:
+            print("portfolio.json changed, reloading")
+            self.load()
+            self.emitted_total = None
+        else:
+            now = self.clock()
+            due = [item for item in self.items if item.due <= now]
+            if not due:
+                return None
+            self.refresh(due)
+        prices = self.value()
+        total = sum(h['value_usd'] for h in prices['holdings'] if h['value_usd'])
+        if self.emitted_total is not None and abs(total - self.emitted_total) < self.threshold * self.emitted_total:
+            return None
+        self.emit(prices, total)
+        return prices
+
+    def emit(self, prices: Dict, total: float) -> None:
+        tmp = self.output_path + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump(prices, f, indent=2)
+        os.replace(tmp, self.output_path)
+        if self.history:
+            self.history.append(prices)
+        change = f" ({(total / self.emitted_total - 1) * 100:+.2f}%)" if self.emitted_total else ""
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] Total portfolio value: ${total:,.2f} USD{change}")
+        self.emitted_total = total
+        self.emits += 1
+
+    def next_wake(self) -> float:
+        """Seconds until the next item is due, capped so portfolio edits are picked up."""
+        wait = min(item.due for item in self.items) - self.clock()
+        return min(max(wait, 1.0), MAX_SLEEP)
+
+    def run(self, max_ticks: Optional[int] = None) -> None:
+        self.load()
+        prices = self.value()
+        self.emit(prices, sum(h['value_usd'] for h in prices['holdings'] if h['value_usd']))
+        ticks = 0
+        try:
+            while max_ticks is None or ticks < max_ticks:
+                self.sleep(self.next_wake())
+                self.tick()
+                ticks += 1
+        except KeyboardInterrupt:
+            pass
+        print(f"Watch stopped: {self.fetches} item fetches, {self.emits} updates written")
+
+    def schedule(self) -> List[Dict]:
+        """Current interval and next due time of every item, soonest first."""
+        return [{"ticker": item.holding['ticker'], "kind": item.kind, "interval": item.interval,
+                 "due": item.due, "fetches": item.fetches}
+                for item in sorted(self.items, key=lambda item: item.due)]
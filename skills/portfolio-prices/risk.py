@@ -0,0 +1,12 @@
+#!/usr/bin/env python3
+"""
+Show portfolio volatility, concentration and VaR from daily closes.
+
+Thin command-line wrapper around pricing.risk.
+"""
+
+from pricing.risk import main
+
+
+if __name__ == "__main__":
+    exit(main())
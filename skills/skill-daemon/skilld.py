@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Warm resident daemon for the skill CLIs.
+
+The daemon listens on a Unix socket and runs skill scripts inside its own
+long-lived interpreter. Each script is imported once. After that, its heavy
+dependencies (yfinance/pandas, youtube_transcript_api, substack_api) and any
+module-level sessions and caches stay loaded between commands.
+
+A command goes in as the script path, argv and working directory. Its stdout
+and stderr stream back to the client, followed by the exit code. Scripts
+share process-wide state (sys.argv, cwd, stdout), so commands run one at a
+time.
+
+The CLIs call forward() before their heavy imports. When the daemon is not
+running, or the command reads stdin ('-'), forward() returns and the script
+runs in-process as before. Set SKILLD=0 to always run in-process.
+
+Usage:
+    python3 skilld.py start      # background, logs to ~/.cache/skilld/skilld.log
+    python3 skilld.py serve      # foreground
+    python3 skilld.py status
+    python3 skilld.py stop
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from pathlib import Path
+from typing import Optional
+
+STATE_DIR = Path(os.path.expanduser("~/.cache/skilld"))
+SOCKET_PATH = Path(os.environ.get("SKILLD_SOCKET") or STATE_DIR / "skilld.sock")
+LOG_PATH = STATE_DIR / "skilld.log"
+SKILLS_DIR = Path(__file__).resolve().parent.parent
+
+# Scripts imported at startup so the first command is already warm
+PRELOAD = (
+    "youtube-transcript/scripts/fetch_transcript.py",
+    "substack/scripts/fetch_newsletter.py",
+    "substack/scripts/fetch_post.py",
+    "substack/scripts/search.py",
+    "portfolio-prices/fetch_prices.py",
+)
+
+
+def forward(script: str):
+    """
+    Run this command in the daemon and exit with its exit code.
+
+    Returns (so the caller runs in-process) when the daemon is disabled or
+    not running, when the command reads stdin, or when the daemon cannot load
+    the script.
+    """
+    if os.environ.get("SKILLD") == "0" or "-" in sys.argv[1:]:
+        return
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(SOCKET_PATH))
+    except OSError:
+        sock.close()
+        return
+    request = {"script": os.path.realpath(script), "argv": sys.argv[1:], "cwd": os.getcwd()}
+    with sock, sock.makefile("rw", encoding="utf-8") as stream:
+        try:
+            stream.write(json.dumps(request) + "\n")
+            stream.flush()
+        except OSError:
+            return
+        for line in stream:
+            message = json.loads(line)
+            if "out" in message:
+                sys.stdout.write(message["out"])
+                sys.stdout.flush()
+            elif "err" in message:
+                sys.stderr.write(message["err"])
+                sys.stderr.flush()
+            elif message.get("fallback"):
+                return
+            elif "exit" in message:
+                sys.exit(message["exit"])
+    print("⚠️  skilld closed the connection before the command finished", file=sys.stderr)
+    sys.exit(1)
+
+
+class _StreamWriter(io.TextIOBase):
+    """File-like object that sends everything written to it to the client as one stream."""
+
+    def __init__(self, send, key: str):
+        self.send = send
+        self.key = key
+
+    def writable(self):
+        return True
+
+    def write(self, data: str) -> int:
+        if data:
+            self.send({self.key: data})
+        return len(data)
+
+    def isatty(self):
+        return False
+
+
+class SkillDaemon:
+    """Loaded script modules and the lock that serializes commands."""
+
+    def __init__(self):
+        self.scripts = {}
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.commands = 0
+
+    def load(self, script: str):
+        """The script imported as a module, re-imported if the file changed since."""
+        mtime = os.stat(script).st_mtime
+        loaded = self.scripts.get(script)
+        if loaded and loaded[0] == mtime:
+            return loaded[1]
+        directory = os.path.dirname(script)
+        if directory not in sys.path:
+            sys.path.insert(0, directory)
+        name = "skilld_" + os.path.splitext(os.path.basename(script))[0]
+        spec = importlib.util.spec_from_file_location(name, script)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        if not callable(getattr(module, "main", None)):
+            raise ImportError(f"{script} has no main()")
+        self.scripts[script] = (mtime, module)
+        return module
+
+    def preload(self):
+        for relative in PRELOAD:
+            script = str(SKILLS_DIR / relative)
+            start = time.perf_counter()
+            try:
+                self.load(script)
+            except BaseException as e:
+                print(f"⚠️  Not preloaded: {relative}: {type(e).__name__}: {e}")
+                continue
+            print(f"✓ Preloaded {relative} ({time.perf_counter() - start:.1f}s)")
+
+    def run(self, request: dict, send) -> None:
+        """Run one command, streaming its output through `send`."""
+        script = os.path.realpath(request["script"])
+        with self.lock:
+            try:
+                module = self.load(script)
+            except BaseException as e:
+                print(f"⚠️  Cannot load {script}: {type(e).__name__}: {e}")
+                send({"fallback": True})
+                return
+            self.commands += 1
+            cwd = os.getcwd()
+            argv = sys.argv
+            stdout, stderr = _StreamWriter(send, "out"), _StreamWriter(send, "err")
+            code = 0
+            try:
+                os.chdir(request.get("cwd") or cwd)
+                sys.argv = [script] + list(request.get("argv", []))
+                with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+                    sys.stdin = io.StringIO("")
+                    try:
+                        code = module.main()
+                    except SystemExit as e:
+                        code = e.code
+                    except Exception:
+                        traceback.print_exc()
+                        code = 1
+            finally:
+                sys.stdin = sys.__stdin__
+                sys.argv = argv
+                os.chdir(cwd)
+            if code is None:
+                code = 0
+            elif not isinstance(code, int):
+                # sys.exit("message") prints the message and exits with 1
+                send({"err": f"{code}\n"})
+                code = 1
+            send({"exit": code})
+
+    def status(self) -> dict:
+        return {"pid": os.getpid(), "uptime": time.time() - self.started, "commands": self.commands,
+                "scripts": sorted(os.path.relpath(script, SKILLS_DIR) for script in self.scripts)}
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        request = json.loads(line)
+
+        def send(message: dict):
+            self.wfile.write((json.dumps(message) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+        try:
+            if request.get("command") == "status":
+                send(self.server.daemon.status())
+            elif request.get("command") == "stop":
+                send({"stopping": True})
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+            else:
+                self.server.daemon.run(request, send)
+        except (BrokenPipeError, ConnectionResetError):
+            # Client went away mid-command; the command itself has finished
+            pass
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(preload: bool = True) -> int:
+    STATE_DIR.mkdir(parents=True, exist_ok=True, mode=0o700)
+    if _request({"command": "status"}) is not None:
+        print(f"skilld is already running on {SOCKET_PATH}")
+        return 1
+    SOCKET_PATH.unlink(missing_ok=True)
+    daemon = SkillDaemon()
+    if preload:
+        daemon.preload()
+    server = _Server(str(SOCKET_PATH), _Handler)
+    server.daemon = daemon
+    os.chmod(SOCKET_PATH, 0o600)
+    print(f"skilld listening on {SOCKET_PATH} (pid {os.getpid()})")
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        SOCKET_PATH.unlink(missing_ok=True)
+    return 0
+
+
+def _request(message: dict) -> Optional[dict]:
+    """Send a control message; None when no daemon answers."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(SOCKET_PATH))
+    except OSError:
+        sock.close()
+        return None
+    try:
+        with sock, sock.makefile("rw", encoding="utf-8") as stream:
+            stream.write(json.dumps(message) + "\n")
+            stream.flush()
+            line = stream.readline()
+    except OSError:
+        # Shutting down: accepted the connection but closed it unanswered
+        return None
+    return json.loads(line) if line else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm resident daemon for the skill CLIs")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve_parser = sub.add_parser("serve", help="Run in the foreground")
+    start_parser = sub.add_parser("start", help="Run in the background")
+    for p in (serve_parser, start_parser):
+        p.add_argument("--no-preload", action="store_true", help="Import scripts on first use instead of at startup")
+    sub.add_parser("status", help="Show whether the daemon is running and what it has loaded")
+    sub.add_parser("stop", help="Stop the daemon")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        return serve(preload=not args.no_preload)
+
+    if args.command == "start":
+        if _request({"command": "status"}) is not None:
+            print(f"skilld is already running on {SOCKET_PATH}")
+            return 0
+        STATE_DIR.mkdir(parents=True, exist_ok=True, mode=0o700)
+        command = [sys.executable, os.path.realpath(__file__), "serve"]
+        if args.no_preload:
+            command.append("--no-preload")
+        with open(LOG_PATH, "a") as log:
+            subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                             start_new_session=True)
+        for _ in range(300):
+            if _request({"command": "status"}) is not None:
+                print(f"✓ skilld started on {SOCKET_PATH}")
+                return 0
+            time.sleep(0.1)
+        print(f"✗ skilld did not start; see {LOG_PATH}")
+        return 1
+
+    status = _request({"command": "status"})
+    if status is None:
+        print("skilld is not running")
+        return 0 if args.command == "stop" else 1
+    if args.command == "stop":
+        _request({"command": "stop"})
+        while _request({"command": "status"}) is not None:
+            time.sleep(0.1)
+        print("✓ skilld stopped")
+        return 0
+    print(f"skilld pid {status['pid']}, up {status['uptime'] / 60:.0f} min, {status['commands']} commands")
+    for script in status["scripts"]:
+        print(f"  {script}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Local SQLite archive of a Substack newsletter.
+
+One database per newsletter under ~/.local/share/substack/, keyed by post ID.
+Each post keeps the metadata the archive listing returned and, once fetched,
+its body. A fingerprint of the editable fields tells an updated post from one
+that only gained likes or comments. When a post changes, its stored body is
+dropped so it gets fetched again.
+
+Paging state lives in the same database. `sync` walks the listing newest
+first and stops at the first page holding a post it already has, so a daily
+run costs one request per newsletter. `backfill` continues towards the
+oldest post from the oldest post already stored, and can be interrupted and
+resumed.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from substack_api import SubstackAuth
+
+ARCHIVE_DIR = Path(os.path.expanduser("~/.local/share/substack"))
+# Posts per archive request
+PAGE_SIZE = 25
+# Pause between archive requests, as substack-api does when paging
+PAGE_DELAY = 0.5
+# Concurrent post-body requests
+CONTENT_WORKERS = 4
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/120.0 Safari/537.36")
+
+# Listing fields that change when the author edits a post; counters are left out
+FINGERPRINT_FIELDS = ('title', 'subtitle', 'description', 'audience', 'post_date', 'updated_at',
+                      'slug', 'canonical_url', 'wordcount', 'truncated_body_text')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    id INTEGER PRIMARY KEY,
+    slug TEXT,
+    title TEXT,
+    subtitle TEXT,
+    url TEXT,
+    post_date TEXT,
+    audience TEXT,
+    fingerprint TEXT NOT NULL,
+    metadata TEXT NOT NULL,
+    body_html TEXT,
+    synced_at REAL NOT NULL,
+    content_at REAL
+);
+CREATE INDEX IF NOT EXISTS posts_date ON posts (post_date);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def newsletter_base(url: str) -> str:
+    """https://host of a newsletter URL; bare hosts are accepted."""
+    parsed = urlparse(url if '://' in url else f"https://{url}")
+    if not parsed.netloc:
+        raise ValueError(f"Not a newsletter URL: {url}")
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+
+def archive_path(url: str, root: Path = ARCHIVE_DIR) -> Path:
+    return Path(root) / f"{urlparse(newsletter_base(url)).netloc}.db"
+
+
+def fingerprint(post: dict) -> str:
+    fields = {key: post.get(key) for key in FINGERPRINT_FIELDS}
+    return hashlib.sha256(json.dumps(fields, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+_auth: Dict[tuple, SubstackAuth] = {}
+
+
+def load_auth(cookies: str) -> Optional[SubstackAuth]:
+    """
+    SubstackAuth for a cookie file, or None if the file does not exist.
+
+    Kept per file and modification time, so a long-lived process (skilld)
+    reuses the session and its open connections.
+    """
+    path = os.path.expanduser(cookies)
+    if not os.path.exists(path):
+        return None
+    key = (path, os.stat(path).st_mtime)
+    if key not in _auth:
+        _auth[key] = SubstackAuth(cookies_path=path)
+    return _auth[key]
+
+
+def make_session(auth=None, workers: int = CONTENT_WORKERS) -> requests.Session:
+    """
+    The authenticated session of a SubstackAuth, or a plain one with a browser User-Agent.
+
+    Its connection pool is sized for `workers` threads, so concurrent requests
+    reuse connections instead of opening and discarding new ones.
+    """
+    if auth is not None and getattr(auth, 'authenticated', False):
+        session = auth.session
+    else:
+        session = requests.Session()
+        session.headers['User-Agent'] = USER_AGENT
+    if getattr(session.get_adapter('https://'), '_pool_maxsize', 0) < workers:
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+    return session
+
+
+class PostArchive:
+    """Posts of one newsletter with their listing metadata, bodies and paging state."""
+
+    def __init__(self, url: str, root: Path = ARCHIVE_DIR):
+        self.url = newsletter_base(url)
+        self.path = archive_path(self.url, root)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+
+    def get_state(self, key: str, default=None):
+        row = self.db.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_state(self, key: str, value):
+        self.db.execute("INSERT OR REPLACE INTO state VALUES (?, ?)", (key, json.dumps(value)))
+
+    def upsert(self, post: dict) -> str:
+        """Store one listing entry; returns 'new', 'updated' or 'unchanged'."""
+        digest = fingerprint(post)
+        row = self.db.execute("SELECT fingerprint FROM posts WHERE id = ?", (post['id'],)).fetchone()
+        values = (post.get('slug'), post.get('title'), post.get('subtitle'), post.get('canonical_url'),
+                  post.get('post_date'), post.get('audience'), digest,
+                  json.dumps(post, ensure_ascii=False, default=str), time.time())
+        if row is None:
+            self.db.execute(
+                "INSERT INTO posts (slug, title, subtitle, url, post_date, audience, fingerprint, metadata, "
+                "synced_at, id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", values + (post['id'],))
+            return 'new'
+        if row[0] == digest:
+            # Counters still change; keep the latest listing without refetching the body
+            self.db.execute("UPDATE posts SET metadata = ?, synced_at = ? WHERE id = ?",
+                            (values[7], values[8], post['id']))
+            return 'unchanged'
+        self.db.execute(
+            "UPDATE posts SET slug = ?, title = ?, subtitle = ?, url = ?, post_date = ?, audience = ?, "
+            "fingerprint = ?, metadata = ?, synced_at = ?, body_html = NULL, content_at = NULL WHERE id = ?",
+            values + (post['id'],))
+        return 'updated'
+
+    def set_body(self, post_id: int, body_html: Optional[str]):
+        self.db.execute("UPDATE posts SET body_html = ?, content_at = ? WHERE id = ?",
+                        (body_html, time.time(), post_id))
+        self.db.commit()
+
+    def posts(self, limit: Optional[int] = None, without_body: bool = False) -> List[dict]:
+        """Stored listing metadata, newest first."""
+        sql = "SELECT metadata FROM posts"
+        if without_body:
+            sql += " WHERE content_at IS NULL"
+        sql += " ORDER BY post_date DESC"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return [json.loads(metadata) for (metadata,) in self.db.execute(sql)]
+
+    def changed_since(self, since: float) -> List[Tuple[dict, Optional[str], str, float]]:
+        """Posts listed or given a body after `since`, as (metadata, body_html, version, changed_at)."""
+        rows = self.db.execute(
+            "SELECT metadata, body_html, fingerprint, content_at, MAX(synced_at, COALESCE(content_at, 0)) "
+            "FROM posts WHERE synced_at > ? OR content_at > ?", (since, since)).fetchall()
+        return [(json.loads(metadata), body, f"{digest}:{content_at}", changed)
+                for metadata, body, digest, content_at, changed in rows]
+
+    def oldest(self) -> Optional[Tuple[str, int]]:
+        """(post_date, id) of the oldest stored post, or None if there is none."""
+        row = self.db.execute("SELECT post_date, id FROM posts ORDER BY post_date, id LIMIT 1").fetchone()
+        return (row[0] or '', row[1]) if row else None
+
+    def stats(self) -> dict:
+        posts, bodies, oldest, newest = self.db.execute(
+            "SELECT COUNT(*), COUNT(content_at), MIN(post_date), MAX(post_date) FROM posts").fetchone()
+        return {'url': self.url, 'posts': posts, 'bodies': bodies, 'oldest': oldest, 'newest': newest,
+                'backfill_done': self.get_state('backfill_done', False),
+                'last_sync': self.get_state('last_sync')}
+
+    def commit(self):
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+
+def archive_page(session: requests.Session, url: str, offset: int, page_size: int = PAGE_SIZE,
+                 sort: str = 'new') -> List[dict]:
+    """One page of the newsletter archive listing."""
+    response = session.get(f"{url}/api/v1/archive",
+                           params={'sort': sort, 'offset': offset, 'limit': page_size}, timeout=30)
+    response.raise_for_status()
+    return response.json()
+
+
+def archive_pages(session: requests.Session, url: str, offset: int = 0, page_size: int = PAGE_SIZE,
+                  sleep: Callable[[float], None] = time.sleep, sort: str = 'new') -> Iterator[List[dict]]:
+    """Pages of the newsletter archive, newest first (or by `sort`), starting at `offset`."""
+    first = True
+    while True:
+        if not first:
+            sleep(PAGE_DELAY)
+        first = False
+        page = archive_page(session, url, offset, page_size, sort)
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        offset += len(page)
+
+
+def sync(archive: PostArchive, session: requests.Session, backfill: bool = False,
+         max_pages: Optional[int] = None, full: bool = False, **paging) -> Dict[str, int]:
+    """
+    Bring the archive up to date. Returns counts of new, updated and unchanged posts and requests made.
+
+    Pages from the newest post until a page holds a post already stored (or,
+    with `full`, through the whole listing to catch edits to old posts). With
+    `backfill`, then continues towards the oldest post from where the oldest
+    stored post is in the listing now, for at most `max_pages` pages.
+    """
+    counts = {'new': 0, 'updated': 0, 'unchanged': 0, 'requests': 0}
+    empty = not archive.db.execute("SELECT 1 FROM posts LIMIT 1").fetchone()
+
+    page_size = paging.get('page_size', PAGE_SIZE)
+    for page in archive_pages(session, archive.url, **paging):
+        counts['requests'] += 1
+        outcomes = [archive.upsert(post) for post in page]
+        for outcome in outcomes:
+            counts[outcome] += 1
+        archive.commit()
+        seen = empty or 'unchanged' in outcomes or 'updated' in outcomes
+        if seen and not full and len(page) == page_size:
+            break
+    else:
+        # Read to the end of the listing, so there is nothing left to backfill
+        archive.set_state('backfill_done', True)
+    archive.set_state('last_sync', time.strftime('%Y-%m-%dT%H:%M:%S'))
+    archive.commit()
+
+    if backfill and not archive.get_state('backfill_done', False):
+        offset = backfill_start(archive, session, counts, **paging)
+        pages = archive_pages(session, archive.url, offset=offset, **paging)
+        for n, page in enumerate(pages, 1):
+            counts['requests'] += 1
+            for post in page:
+                counts[archive.upsert(post)] += 1
+            archive.commit()
+            if max_pages and n >= max_pages:
+                break
+        else:
+            archive.set_state('backfill_done', True)
+            archive.commit()
+    return counts
+
+
+def backfill_start(archive: PostArchive, session: requests.Session, counts: Dict[str, int],
+                   page_size: int = PAGE_SIZE, sleep: Callable[[float], None] = time.sleep, **paging) -> int:
+    """
+    Listing offset to resume the backfill from: a page that reaches back to the oldest stored post.
+
+    Posts get deleted, unpublished and re-dated, so no saved offset stays
+    right. The stored posts cover the head of the listing, so the oldest of
+    them should be at their count less one. While the page there starts past
+    it (posts were removed above), posts could be skipped, so the start
+    steps back a page at a time. Posts read again are only updated.
+    """
+    oldest = archive.oldest()
+    if oldest is None:
+        return 0
+    total = archive.db.execute("SELECT COUNT(*) FROM posts").fetchone()[0]
+    offset = max(0, total - 1)
+    while offset > 0:
+        counts['requests'] += 1
+        page = archive_page(session, archive.url, offset, page_size, **paging)
+        if page and (page[0].get('post_date') or '') >= oldest[0]:
+            break
+        offset = max(0, offset - page_size)
+        sleep(PAGE_DELAY)
+    return offset
+
+
+def list_posts(session: requests.Session, url: str, limit: int, sort: str = 'new') -> List[dict]:
+    """Listing metadata of the first `limit` posts."""
+    posts = []
+    for page in archive_pages(session, newsletter_base(url), page_size=min(limit, PAGE_SIZE), sort=sort):
+        posts.extend(page)
+        if len(posts) >= limit:
+            break
+    return posts[:limit]
+
+
+def fetch_body(session: requests.Session, url: str, slug: str) -> Optional[str]:
+    """body_html of one post; None when the post is paywalled for this session."""
+    response = session.get(f"{newsletter_base(url)}/api/v1/posts/{slug}", timeout=30)
+    response.raise_for_status()
+    return response.json().get('body_html')
+
+
+def fetch_bodies(session: requests.Session, url: str, posts: Iterable[dict],
+                 workers: int = CONTENT_WORKERS) -> Iterator[Tuple[dict, Optional[str], Optional[str]]]:
+    """
+    Fetch the bodies of listed posts on a pool of `workers` threads sharing `session`.
+
+    Yields (post, body_html, error) as each request finishes. A failed post
+    has an error message instead of a body, and the others carry on.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(fetch_body, session, url, post['slug']): post for post in posts}
+        for future in as_completed(futures):
+            post = futures[future]
+            try:
+                yield post, future.result(), None
+            except Exception as e:
+                yield post, None, f"{type(e).__name__}: {e}"
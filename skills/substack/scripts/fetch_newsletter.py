@@ -2,8 +2,42 @@
 """Fetch posts from a Substack newsletter."""
 import argparse
 import json
+import os
 import sys
-from substack_api import Newsletter, SubstackAuth
+
+if __name__ == "__main__":
+    # Hand the command to the warm skill daemon when it is running (skills/skill-daemon)
+    sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "..", "skill-daemon"))
+    try:
+        from skilld import forward
+    except ImportError:
+        pass
+    else:
+        forward(__file__)
+
+from substack_api import Newsletter
+
+from archive import CONTENT_WORKERS, fetch_bodies, list_posts, load_auth, make_session
+
+
+def fetch_with_content(url, auth, limit, sort, workers):
+    """Listed posts with their body_html, fetched concurrently over one session."""
+    session = make_session(auth, workers)
+    posts = list_posts(session, url, limit, sort="new" if sort == "recent" else sort)
+    failed = 0
+    for post, body, error in fetch_bodies(session, url, posts, workers):
+        if error:
+            post["error"] = error
+            failed += 1
+            print(f"✗ {post['slug']}: {error}", file=sys.stderr)
+            continue
+        post["body_html"] = body
+        if body is None and post.get("audience") == "only_paid":
+            print(f"⚠️  {post['slug']} is paywalled. Content may be limited without valid subscription.",
+                  file=sys.stderr)
+    if failed:
+        print(f"⚠️  {failed} of {len(posts)} posts failed", file=sys.stderr)
+    return posts, failed
 
 def main():
     parser = argparse.ArgumentParser(description="Fetch posts from a Substack newsletter")
@@ -12,17 +46,19 @@ def main():
     parser.add_argument("--limit", type=int, default=10, help="Number of posts to fetch")
     parser.add_argument("--sort", choices=["recent", "top"], default="recent", help="Sort order")
     parser.add_argument("--output", help="Output JSON file")
+    parser.add_argument("--with-content", action="store_true", help="Also fetch the body of every listed post")
+    parser.add_argument("--workers", type=int, default=CONTENT_WORKERS, help="Concurrent requests for --with-content")
     args = parser.parse_args()
 
     # Initialize auth if cookies exist
-    import os
-    cookie_path = os.path.expanduser(args.cookies)
-    auth = None
-    if os.path.exists(cookie_path):
-        auth = SubstackAuth(cookies_path=cookie_path)
+    auth = load_auth(args.cookies)
 
-    newsletter = Newsletter(args.url, auth=auth)
-    posts = newsletter.get_posts(limit=args.limit, sorting=args.sort)
+    failed = 0
+    if args.with_content:
+        posts, failed = fetch_with_content(args.url, auth, args.limit, args.sort, args.workers)
+    else:
+        newsletter = Newsletter(args.url, auth=auth)
+        posts = newsletter.get_posts(limit=args.limit, sorting=args.sort)
 
     if args.output:
         with open(args.output, "w") as f:
@@ -30,6 +66,7 @@ def main():
         print(f"Saved {len(posts)} posts to {args.output}")
     else:
         print(json.dumps(posts, indent=2, default=str))
+    return 1 if failed else 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -4,7 +4,20 @@ import argparse
 import json
 import os
 import sys
-from substack_api import Post, SubstackAuth
+
+if __name__ == "__main__":
+    # Hand the command to the warm skill daemon when it is running (skills/skill-daemon)
+    sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "..", "skill-daemon"))
+    try:
+        from skilld import forward
+    except ImportError:
+        pass
+    else:
+        forward(__file__)
+
+from substack_api import Post
+
+from archive import load_auth
 
 def main():
     parser = argparse.ArgumentParser(description="Fetch content from a Substack post")
@@ -15,10 +28,7 @@ def main():
     args = parser.parse_args()
 
     # Initialize auth if cookies exist
-    cookie_path = os.path.expanduser(args.cookies)
-    auth = None
-    if os.path.exists(cookie_path):
-        auth = SubstackAuth(cookies_path=cookie_path)
+    auth = load_auth(args.cookies)
 
     post = Post(args.url, auth=auth)
 
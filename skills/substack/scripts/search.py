@@ -1,28 +1,71 @@
 #!/usr/bin/env python3
-"""Search posts within a Substack newsletter."""
+"""Search posts within a Substack newsletter, or offline across every archived newsletter."""
 import argparse
 import json
 import os
+import sqlite3
 import sys
-from substack_api import Newsletter, SubstackAuth
+import time
+
+if __name__ == "__main__":
+    # Hand the command to the warm skill daemon when it is running (skills/skill-daemon)
+    sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "..", "skill-daemon"))
+    try:
+        from skilld import forward
+    except ImportError:
+        pass
+    else:
+        forward(__file__)
+
+from substack_api import Newsletter
+
+from archive import ARCHIVE_DIR, load_auth
+from search_index import SearchIndex, index_path
+
+
+def search_offline(args):
+    """Ranked results from the local index, refreshed from the archives first."""
+    start = time.perf_counter()
+    index = SearchIndex(index_path(args.archive_dir))
+    try:
+        index.update(args.archive_dir)
+        return index.search(args.query, newsletter=args.url, since=args.since, until=args.until,
+                            limit=args.limit, raw=args.raw), time.perf_counter() - start
+    finally:
+        index.close()
+
 
 def main():
     parser = argparse.ArgumentParser(description="Search posts in a Substack newsletter")
-    parser.add_argument("url", help="Newsletter URL (e.g., https://example.substack.com)")
+    parser.add_argument("url", nargs="?",
+                        help="Newsletter URL (e.g., https://example.substack.com); optional with --offline")
     parser.add_argument("query", help="Search query")
     parser.add_argument("--cookies", default="~/.substack_cookies.json", help="Path to cookies JSON file")
     parser.add_argument("--limit", type=int, default=5, help="Number of results")
     parser.add_argument("--output", help="Output JSON file")
+    parser.add_argument("--offline", action="store_true", help="Search posts archived by sync.py, without network calls")
+    parser.add_argument("--since", help="Offline: only posts on or after this date (YYYY-MM-DD)")
+    parser.add_argument("--until", help="Offline: only posts on or before this date (YYYY-MM-DD)")
+    parser.add_argument("--archive-dir", default=str(ARCHIVE_DIR), help="Offline: directory holding the archives")
+    parser.add_argument("--raw", action="store_true", help="Offline: pass the query as FTS5 syntax (AND/OR/NEAR, prefix*)")
     args = parser.parse_args()
 
-    # Initialize auth if cookies exist
-    cookie_path = os.path.expanduser(args.cookies)
-    auth = None
-    if os.path.exists(cookie_path):
-        auth = SubstackAuth(cookies_path=cookie_path)
+    if args.offline:
+        try:
+            results, elapsed = search_offline(args)
+        except sqlite3.OperationalError as e:
+            print(f"Error: invalid query: {e}", file=sys.stderr)
+            return 1
+        print(f"{len(results)} results in {elapsed * 1000:.0f} ms", file=sys.stderr)
+    else:
+        if not args.url:
+            parser.error("a newsletter URL is required unless --offline is given")
+
+        # Initialize auth if cookies exist
+        auth = load_auth(args.cookies)
 
-    newsletter = Newsletter(args.url, auth=auth)
-    results = newsletter.search_posts(args.query, limit=args.limit)
+        newsletter = Newsletter(args.url, auth=auth)
+        results = newsletter.search_posts(args.query, limit=args.limit)
 
     if args.output:
         with open(args.output, "w") as f:
@@ -30,6 +73,7 @@ def main():
         print(f"Saved {len(results)} results to {args.output}")
     else:
         print(json.dumps(results, indent=2, default=str))
+    return 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
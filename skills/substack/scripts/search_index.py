@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Offline full-text index over archived Substack posts.
+
+One SQLite FTS5 index covers every newsletter synced into
+~/.local/share/substack/. Posts are ranked by BM25. A match in the title
+counts five times as much as one in the body, and a match in the subtitle
+twice as much. Each archive is re-read only from the last post it changed,
+and a post is re-indexed only when its listing fingerprint or body changes.
+"""
+
+import sqlite3
+import threading
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import List, Optional
+from urllib.parse import urlparse
+
+from archive import ARCHIVE_DIR, PostArchive, newsletter_base
+
+
+def index_path(root: Path = ARCHIVE_DIR) -> Path:
+    """Index next to the archives it covers; a subdirectory keeps it out of their *.db glob."""
+    return Path(root) / "search" / "index.db"
+
+
+INDEX_PATH = index_path()
+# bm25() column weights for title, subtitle and body
+TITLE_WEIGHT = 5.0
+SUBTITLE_WEIGHT = 2.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    id INTEGER PRIMARY KEY,
+    newsletter TEXT NOT NULL,
+    post_id INTEGER NOT NULL,
+    version TEXT NOT NULL,
+    title TEXT,
+    subtitle TEXT,
+    body TEXT,
+    url TEXT,
+    post_date TEXT,
+    UNIQUE (newsletter, post_id)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(
+    title, subtitle, body, content='posts', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS posts_ai AFTER INSERT ON posts BEGIN
+    INSERT INTO posts_fts (rowid, title, subtitle, body) VALUES (new.id, new.title, new.subtitle, new.body);
+END;
+CREATE TRIGGER IF NOT EXISTS posts_ad AFTER DELETE ON posts BEGIN
+    INSERT INTO posts_fts (posts_fts, rowid, title, subtitle, body)
+    VALUES ('delete', old.id, old.title, old.subtitle, old.body);
+END;
+CREATE TABLE IF NOT EXISTS archives (
+    newsletter TEXT PRIMARY KEY,
+    watermark REAL NOT NULL
+);
+"""
+
+
+class _TextExtractor(HTMLParser):
+    SKIP = {'script', 'style'}
+
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+        self.skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self.skipping += 1
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP and self.skipping:
+            self.skipping -= 1
+
+    def handle_data(self, data):
+        if not self.skipping:
+            self.parts.append(data)
+
+
+def html_text(html: Optional[str]) -> str:
+    """Visible text of a post body."""
+    if not html:
+        return ''
+    parser = _TextExtractor()
+    parser.feed(html)
+    parser.close()
+    return ' '.join(' '.join(parser.parts).split())
+
+
+def fts_query(query: str) -> str:
+    """Quote each word so user input is matched literally rather than parsed as FTS syntax."""
+    return ' '.join('"' + word.replace('"', '""') + '"' for word in query.split())
+
+
+class SearchIndex:
+    """BM25 index of posts from every local newsletter archive."""
+
+    def __init__(self, path: Path = INDEX_PATH):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+
+    def add_archive(self, archive: PostArchive) -> int:
+        """Index posts of `archive` that changed since it was last indexed; returns how many."""
+        newsletter = urlparse(archive.url).netloc
+        with self.lock:
+            row = self.db.execute("SELECT watermark FROM archives WHERE newsletter = ?", (newsletter,)).fetchone()
+            watermark = row[0] if row else 0.0
+            indexed = 0
+            with self.db:
+                for post, body_html, version, changed in archive.changed_since(watermark):
+                    watermark = max(watermark, changed)
+                    current = self.db.execute("SELECT version FROM posts WHERE newsletter = ? AND post_id = ?",
+                                              (newsletter, post['id'])).fetchone()
+                    if current and current[0] == version:
+                        continue
+                    # Posts without a fetched body are searchable by their listing preview
+                    body = html_text(body_html) if body_html else (
+                        post.get('truncated_body_text') or post.get('description') or '')
+                    self.db.execute("DELETE FROM posts WHERE newsletter = ? AND post_id = ?",
+                                    (newsletter, post['id']))
+                    self.db.execute(
+                        "INSERT INTO posts (newsletter, post_id, version, title, subtitle, body, url, post_date) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (newsletter, post['id'], version, post.get('title'), post.get('subtitle'), body,
+                         post.get('canonical_url'), post.get('post_date')))
+                    indexed += 1
+                self.db.execute("INSERT OR REPLACE INTO archives VALUES (?, ?)", (newsletter, watermark))
+            return indexed
+
+    def update(self, root: Path = ARCHIVE_DIR) -> int:
+        """Bring the index up to date with every archive under `root`."""
+        indexed = 0
+        for path in sorted(Path(root).glob("*.db")):
+            archive = PostArchive(path.stem, root)
+            try:
+                indexed += self.add_archive(archive)
+            finally:
+                archive.close()
+        return indexed
+
+    def search(self, query: str, newsletter: Optional[str] = None, since: Optional[str] = None,
+               until: Optional[str] = None, limit: int = 10, raw: bool = False) -> List[dict]:
+        """Best-matching posts by title-boosted BM25; `since` / `until` are inclusive YYYY-MM-DD dates."""
+        rank = f"bm25(posts_fts, {TITLE_WEIGHT}, {SUBTITLE_WEIGHT}, 1.0)"
+        sql = f"""
+            SELECT p.newsletter, p.title, p.url, p.post_date, snippet(posts_fts, 2, '[', ']', '…', 24), {rank}
+            FROM posts_fts JOIN posts p ON p.id = posts_fts.rowid
+            WHERE posts_fts MATCH ?"""
+        params = [query if raw else fts_query(query)]
+        if newsletter:
+            sql += " AND p.newsletter = ?"
+            params.append(urlparse(newsletter_base(newsletter)).netloc)
+        if since:
+            sql += " AND substr(p.post_date, 1, 10) >= ?"
+            params.append(since)
+        if until:
+            sql += " AND substr(p.post_date, 1, 10) <= ?"
+            params.append(until)
+        sql += f" ORDER BY {rank} LIMIT ?"
+        params.append(limit)
+        with self.lock:
+            rows = self.db.execute(sql, params).fetchall()
+        return [{'newsletter': nl, 'title': title, 'url': url, 'post_date': date, 'snippet': snippet,
+                 'score': -score} for nl, title, url, date, snippet, score in rows]
+
+    def stats(self) -> dict:
+        with self.lock:
+            posts, newsletters = self.db.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT newsletter) FROM posts").fetchone()
+        return {'posts': posts, 'newsletters': newsletters}
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Sync Substack newsletters into local archives, fetching only new or updated posts."""
+import argparse
+import sys
+from pathlib import Path
+
+from archive import ARCHIVE_DIR, CONTENT_WORKERS, PostArchive, fetch_bodies, load_auth, make_session, sync
+from search_index import SearchIndex, index_path
+
+
+def followed_newsletters(root: Path) -> list:
+    """Newsletters that already have an archive, so `sync.py` alone refreshes all of them."""
+    return [f"https://{path.stem}" for path in sorted(Path(root).glob("*.db"))]
+
+
+def store_bodies(archive: PostArchive, session, workers: int) -> tuple:
+    """Fetch bodies for archived posts that have none yet; returns (stored, failed)."""
+    stored = failed = 0
+    for post, body, error in fetch_bodies(session, archive.url, archive.posts(without_body=True), workers):
+        if error:
+            print(f"  ✗ {post['slug']}: {error}", file=sys.stderr)
+            failed += 1
+        else:
+            archive.set_body(post["id"], body)
+            stored += 1
+    return stored, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync Substack newsletters into local SQLite archives")
+    parser.add_argument("urls", nargs="*", help="Newsletter URLs (default: every newsletter already archived)")
+    parser.add_argument("--file", help="File with one newsletter URL per line")
+    parser.add_argument("--cookies", default="~/.substack_cookies.json", help="Path to cookies JSON file")
+    parser.add_argument("--backfill", action="store_true", help="Also fetch older posts, resuming from the oldest archived post")
+    parser.add_argument("--max-pages", type=int, help="Backfill at most this many pages per newsletter this run")
+    parser.add_argument("--full", action="store_true", help="Re-read the whole listing to catch edits to old posts")
+    parser.add_argument("--with-content", action="store_true", help="Also fetch bodies of posts archived without one")
+    parser.add_argument("--workers", type=int, default=CONTENT_WORKERS, help="Concurrent requests for --with-content")
+    parser.add_argument("--status", action="store_true", help="Show archive stats without syncing")
+    parser.add_argument("--archive-dir", default=str(ARCHIVE_DIR), help="Directory holding the archives")
+    args = parser.parse_args()
+
+    urls = list(args.urls)
+    if args.file:
+        with open(args.file) as f:
+            urls += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    urls = urls or followed_newsletters(args.archive_dir)
+    if not urls:
+        parser.error("no newsletters given and none archived yet")
+
+    if args.status:
+        for url in urls:
+            archive = PostArchive(url, args.archive_dir)
+            stats = archive.stats()
+            archive.close()
+            history = "complete" if stats["backfill_done"] else "partial"
+            print(f"{stats['url']}: {stats['posts']} posts ({stats['bodies']} with content), "
+                  f"{stats['oldest'] or '-'} → {stats['newest'] or '-'}, history {history}, "
+                  f"last sync {stats['last_sync'] or 'never'}")
+        return 0
+
+    # Initialize auth if cookies exist
+    auth = load_auth(args.cookies)
+    session = make_session(auth, args.workers)
+
+    index = SearchIndex(index_path(args.archive_dir))
+    failed = 0
+    for url in urls:
+        try:
+            archive = PostArchive(url, args.archive_dir)
+        except ValueError as e:
+            print(f"✗ {e}", file=sys.stderr)
+            failed += 1
+            continue
+        try:
+            counts = sync(archive, session, backfill=args.backfill, max_pages=args.max_pages, full=args.full)
+            if args.with_content:
+                counts["bodies"], counts["failed"] = store_bodies(archive, session, args.workers)
+            counts["indexed"] = index.add_archive(archive)
+        except Exception as e:
+            # Pages already stored stay committed; the next run picks up from there
+            print(f"✗ {archive.url}: {type(e).__name__}: {e}", file=sys.stderr)
+            failed += 1
+            continue
+        finally:
+            archive.close()
+        summary = f"✓ {archive.url}: {counts['new']} new, {counts['updated']} updated ({counts['requests']} requests)"
+        if args.with_content:
+            summary += f", {counts['bodies']} bodies fetched"
+            if counts["failed"]:
+                summary += f", {counts['failed']} failed"
+                failed += 1
+        print(summary)
+    index.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Health-scored proxy pool for transcript fetching.
+
+Proxies are loaded from a file, one URL per line. Each proxy has a score: its
+smoothed success rate divided by its latency (EWMA), penalised by requests
+already in flight on it. Each request picks an available proxy at random
+weighted by score. Healthy proxies take most of the traffic, load still
+spreads across IPs, and new proxies get tried. A proxy that gets
+RequestBlocked is quarantined. Its cool-down starts at one minute and doubles
+with every further block, up to an hour. Stats and quarantines are saved
+between runs.
+
+Usage:
+    python3 proxy_pool.py stats proxies.txt
+    python3 proxy_pool.py simulate --proxies 5 --videos 100   # offline, local stand-in proxies
+"""
+
+import argparse
+import contextlib
+import json
+import math
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from transcript_cache import CACHE_DIR
+
+STATE_PATH = CACHE_DIR / "proxies.json"
+QUARANTINE = 60.0
+QUARANTINE_MAX = 3600.0
+# Weight of the newest sample in the latency moving average
+LATENCY_ALPHA = 0.3
+# Assumed latency for proxies without samples yet, so new proxies get tried
+DEFAULT_LATENCY = 1.0
+# Latencies below this count as equal, so one very fast proxy cannot take all traffic
+MIN_LATENCY = 0.1
+
+
+def load_proxy_file(path: str) -> List[str]:
+    urls = []
+    for line in Path(path).read_text(encoding='utf-8').splitlines():
+        line = line.strip()
+        if line and not line.startswith('#') and line not in urls:
+            urls.append(line)
+    return urls
+
+
+class ProxyHealth:
+    """Counters, latency and quarantine state of one proxy."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.successes = 0
+        self.failures = 0
+        self.blocks = 0
+        self.latency: Optional[float] = None
+        self.cooldown = QUARANTINE
+        self.quarantined_until = 0.0
+        self.in_flight = 0
+
+    def score(self) -> float:
+        attempts = self.successes + self.failures + self.blocks
+        success_rate = (self.successes + 1) / (attempts + 2)
+        latency = max(self.latency or DEFAULT_LATENCY, MIN_LATENCY)
+        return success_rate / (latency * (1 + self.in_flight))
+
+    def to_dict(self) -> dict:
+        return {'url': self.url, 'successes': self.successes, 'failures': self.failures, 'blocks': self.blocks,
+                'latency': self.latency, 'cooldown': self.cooldown, 'quarantined_until': self.quarantined_until}
+
+    def load(self, data: dict):
+        for key in ('successes', 'failures', 'blocks', 'latency', 'cooldown', 'quarantined_until'):
+            if key in data:
+                setattr(self, key, data[key])
+
+
+class ProxyPool:
+    """Routes requests to the healthiest proxies and quarantines blocked ones."""
+
+    def __init__(self, urls: List[str], client_factory: Optional[Callable[[str], object]] = None,
+                 state_path: Optional[Path] = STATE_PATH, clock: Callable[[], float] = time.time,
+                 sleep: Callable[[float], None] = time.sleep, rng: Optional[random.Random] = None):
+        if not urls:
+            raise ValueError("proxy pool is empty")
+        self.proxies: Dict[str, ProxyHealth] = {url: ProxyHealth(url) for url in urls}
+        self.client_factory = client_factory
+        self.state_path = Path(state_path) if state_path else None
+        self.clock = clock
+        self.sleep = sleep
+        self.rng = rng or random.Random()
+        self.lock = threading.Lock()
+        if self.state_path and self.state_path.exists():
+            try:
+                saved = json.loads(self.state_path.read_text(encoding='utf-8'))
+            except ValueError:
+                saved = {}
+            for url, data in saved.items():
+                if url in self.proxies:
+                    self.proxies[url].load(data)
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> "ProxyPool":
+        return cls(load_proxy_file(path), **kwargs)
+
+    def acquire(self) -> str:
+        """A proxy out of quarantine, chosen by score; waits for the first release if all are quarantined."""
+        while True:
+            with self.lock:
+                now = self.clock()
+                available = [p for p in self.proxies.values() if p.quarantined_until <= now]
+                if available:
+                    chosen = self.rng.choices(available, weights=[p.score() for p in available])[0]
+                    chosen.in_flight += 1
+                    return chosen.url
+                wait = min(p.quarantined_until for p in self.proxies.values()) - now
+            print(f"⚠️  All proxies quarantined, waiting {wait:.0f}s")
+            self.sleep(wait)
+
+    def release(self, url: str, outcome: str, latency: Optional[float] = None):
+        """Record the outcome of a request: 'ok', 'blocked' or 'error'."""
+        with self.lock:
+            proxy = self.proxies[url]
+            proxy.in_flight = max(0, proxy.in_flight - 1)
+            if outcome == 'ok':
+                proxy.successes += 1
+                proxy.cooldown = QUARANTINE
+                if latency is not None:
+                    proxy.latency = latency if proxy.latency is None else (
+                        LATENCY_ALPHA * latency + (1 - LATENCY_ALPHA) * proxy.latency)
+            elif outcome == 'blocked':
+                proxy.blocks += 1
+                proxy.quarantined_until = self.clock() + proxy.cooldown
+                print(f"⚠️  Proxy {url} blocked, quarantined for {proxy.cooldown:.0f}s")
+                proxy.cooldown = min(proxy.cooldown * 2, QUARANTINE_MAX)
+            else:
+                proxy.failures += 1
+
+    def client(self, url: str):
+        """Client for `url` from the factory, which decides what is reused (make_client: one per thread)."""
+        return self.client_factory(url)
+
+    def stats(self) -> List[dict]:
+        now = self.clock()
+        with self.lock:
+            rows = []
+            for proxy in sorted(self.proxies.values(), key=ProxyHealth.score, reverse=True):
+                row = proxy.to_dict()
+                row['score'] = proxy.score()
+                row['quarantined_for'] = max(0.0, proxy.quarantined_until - now)
+                rows.append(row)
+            return rows
+
+    def print_stats(self):
+        print(f"{'proxy':<40} {'ok':>5} {'err':>5} {'blk':>5} {'latency':>8} {'score':>7}  status")
+        for row in self.stats():
+            latency = f"{row['latency']:.2f}s" if row['latency'] is not None else "-"
+            status = f"quarantined {math.ceil(row['quarantined_for'])}s" if row['quarantined_for'] else "ok"
+            print(f"{row['url']:<40} {row['successes']:>5} {row['failures']:>5} {row['blocks']:>5} "
+                  f"{latency:>8} {row['score']:>7.3f}  {status}")
+
+    def save(self):
+        if not self.state_path:
+            return
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.lock:
+            data = {url: proxy.to_dict() for url, proxy in self.proxies.items()}
+        tmp = self.state_path.with_name(self.state_path.name + '.tmp')
+        tmp.write_text(json.dumps(data, indent=2), encoding='utf-8')
+        tmp.replace(self.state_path)
+
+
+class StandInProxy:
+    """
+    Local HTTP proxy standing in for one pool proxy, with YouTube behind it.
+
+    Answers the three requests of a transcript fetch (watch page, innertube
+    player, timedtext track) after `latency` seconds. Once blocked, by chance
+    (`block_rate` per video) or after `block_after` videos, the watch page
+    answers 429 as YouTube does. Proxies only see absolute-URI requests for
+    http:// URLs, so fetch inside youtube_over_http().
+    """
+
+    def __init__(self, latency: float, block_rate: float = 0.0, block_after: Optional[int] = None,
+                 rng: Optional[random.Random] = None):
+        self.latency = latency
+        self.block_rate = block_rate
+        self.block_after = block_after
+        self.rng = rng or random.Random()
+        self.videos = 0
+        self.blocks = 0
+        self._lock = threading.Lock()
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stand_in._serve(self)
+
+            def do_POST(self):
+                stand_in._serve(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def _blocked(self) -> bool:
+        with self._lock:
+            self.videos += 1
+            blocked = ((self.block_after is not None and self.videos > self.block_after)
+                       or self.rng.random() < self.block_rate)
+            self.blocks += blocked
+            return blocked
+
+    def _serve(self, handler: BaseHTTPRequestHandler):
+        time.sleep(self.latency)
+        length = int(handler.headers.get('Content-Length') or 0)
+        body = handler.rfile.read(length) if length else b''
+        path = urlsplit(handler.path).path
+        if path == '/watch':
+            if self._blocked():
+                return self._send(handler, 429, 'text/html', b'Too Many Requests')
+            return self._send(handler, 200, 'text/html', b'<script>ytcfg.set({"INNERTUBE_API_KEY": "stand-in"})</script>')
+        if path == '/youtubei/v1/player':
+            video_id = json.loads(body)['videoId']
+            track = {'baseUrl': f"http://www.youtube.com/api/timedtext?v={video_id}&lang=en",
+                     'name': {'runs': [{'text': 'English'}]}, 'languageCode': 'en', 'isTranslatable': False}
+            data = {'playabilityStatus': {'status': 'OK'},
+                    'captions': {'playerCaptionsTracklistRenderer': {'captionTracks': [track]}}}
+            return self._send(handler, 200, 'application/json', json.dumps(data).encode())
+        if path == '/api/timedtext':
+            return self._send(handler, 200, 'text/xml',
+                              b'<transcript><text start="0.0" dur="1.5">stand-in transcript</text></transcript>')
+        self._send(handler, 404, 'text/plain', b'not found')
+
+    @staticmethod
+    def _send(handler: BaseHTTPRequestHandler, status: int, content_type: str, body: bytes):
+        handler.send_response(status)
+        handler.send_header('Content-Type', content_type)
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@contextlib.contextmanager
+def youtube_over_http() -> Iterator[None]:
+    """Make youtube-transcript-api request plain http:// YouTube URLs, so stand-in proxies can answer them."""
+    from youtube_transcript_api import _transcripts
+    saved = _transcripts.WATCH_URL, _transcripts.INNERTUBE_API_URL
+    _transcripts.WATCH_URL, _transcripts.INNERTUBE_API_URL = (url.replace('https://', 'http://', 1)
+                                                              for url in saved)
+    try:
+        yield
+    finally:
+        _transcripts.WATCH_URL, _transcripts.INNERTUBE_API_URL = saved
+
+
+def simulate(stand_ins: List[StandInProxy], videos: int, workers: int = 4,
+             seed: int = 0) -> Tuple[ProxyPool, Counter]:
+    """
+    Fetch `videos` transcripts with fetch_via_pool through the stand-ins, `workers` at a time.
+
+    Goes through the real fetch path: make_client, youtube-transcript-api and
+    HTTP over local sockets. Returns the pool, for its stats, and the count of
+    outcomes per video.
+    """
+    from youtube_transcript_api._errors import RequestBlocked
+    from fetch_transcript import fetch_via_pool, make_client
+
+    pool = ProxyPool([proxy.url for proxy in stand_ins], client_factory=make_client, state_path=None,
+                     rng=random.Random(seed))
+
+    def fetch(video_id: str) -> str:
+        try:
+            fetch_via_pool(pool, video_id, len(pool.proxies))
+        except RequestBlocked:
+            return 'blocked'
+        except Exception as e:
+            return type(e).__name__
+        return 'ok'
+
+    with youtube_over_http(), ThreadPoolExecutor(max_workers=workers) as executor:
+        outcomes = Counter(executor.map(fetch, [f"video{i:06d}" for i in range(videos)]))
+    return pool, outcomes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or simulate the transcript proxy pool")
+    sub = parser.add_subparsers(dest='command', required=True)
+    stats = sub.add_parser('stats', help="Saved per-proxy health for the proxies in a file")
+    stats.add_argument('proxy_file', help="File with one proxy URL per line")
+    sim = sub.add_parser('simulate', help="Fetch transcripts through local stand-in proxies, some slow, "
+                                          "blocked or down")
+    sim.add_argument('--proxies', type=int, default=5, help="Number of stand-in proxies")
+    sim.add_argument('--videos', type=int, default=100, help="Transcripts to fetch")
+    sim.add_argument('--workers', type=int, default=4, help="Concurrent fetches")
+    sim.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == 'stats':
+        ProxyPool.from_file(args.proxy_file).print_stats()
+        return 0
+
+    rng = random.Random(args.seed)
+    kinds = ['fast', 'slow', 'flaky', 'soon blocked', 'down']
+    stand_ins = []
+    for i in range(args.proxies):
+        kind = i % len(kinds)
+        stand_in = StandInProxy(
+            latency=[0.01, 0.15, 0.03, 0.02, 0.0][kind],
+            block_rate=[0.0, 0.0, 0.2, 0.0, 0.0][kind],
+            block_after=[None, None, None, 10, None][kind],
+            rng=rng,
+        )
+        if kinds[kind] == 'down':
+            # Nothing listens on its port any more: connections are refused
+            stand_in.close()
+        print(f"{stand_in.url:<40} {kinds[kind]}")
+        stand_ins.append(stand_in)
+    print()
+    pool, outcomes = simulate(stand_ins, args.videos, args.workers, args.seed)
+    pool.print_stats()
+    print("\nVideos: " + ", ".join(f"{outcome} {n}" for outcome, n in sorted(outcomes.items())))
+    for stand_in in stand_ins:
+        if stand_in.videos:
+            print(f"{stand_in.url}: {stand_in.videos} videos, {stand_in.blocks} blocked")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
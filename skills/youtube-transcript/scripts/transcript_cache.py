@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+On-disk cache of fetched YouTube transcripts.
+
+Segment lists are stored zlib-compressed under the SHA-256 of their content,
+so identical transcripts share one file. A SQLite index maps each
+(video_id, language_code, generated) track to its blob and remembers when it
+was last used. When blobs exceed the size cap, the least recently used tracks
+are dropped first. Each video's track listing is kept too, so --all-langs can
+be answered offline.
+
+Usage:
+    python3 transcript_cache.py            # show cache stats
+    python3 transcript_cache.py --clear    # empty the cache
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+CACHE_DIR = Path(os.path.expanduser("~/.cache/youtube-transcript"))
+MAX_CACHE_MB = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    video_id TEXT NOT NULL,
+    language_code TEXT NOT NULL,
+    generated INTEGER NOT NULL,
+    language TEXT,
+    digest TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (video_id, language_code, generated)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS listings (
+    video_id TEXT PRIMARY KEY,
+    tracks TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+"""
+
+
+def encode_segments(segments: list) -> bytes:
+    """Canonical JSON bytes of a segment list; their SHA-256 is the content address."""
+    return json.dumps(segments, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def segment_digest(segments: list) -> str:
+    return hashlib.sha256(encode_segments(segments)).hexdigest()
+
+
+class TrackSegments(list):
+    """Segment list that remembers which track it came from."""
+
+    def __init__(self, segments: list, language_code: str, generated: bool):
+        super().__init__(segments)
+        self.language_code = language_code
+        self.generated = generated
+
+
+class TranscriptCache:
+    """Compressed, content-addressed transcript segments with LRU eviction."""
+
+    def __init__(self, root: Path = CACHE_DIR, max_mb: float = MAX_CACHE_MB):
+        self.root = Path(root)
+        self.objects = self.root / "objects"
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        # Batch mode shares one cache between worker threads
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.root / "index.db", check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        self.hits = 0
+        self.misses = 0
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.objects / digest[:2] / digest[2:]
+
+    def get(self, video_id: str, language_code: str, generated: bool) -> Optional[list]:
+        """Cached segments of one track, or None."""
+        with self.lock:
+            segments = self._use(video_id, language_code, generated)
+            if segments is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return segments
+
+    def find(self, video_id: str, languages: List[str]) -> Optional[Tuple[list, str, bool, str]]:
+        """
+        Best cached track for a language preference list, as (segments, language_code, generated, language).
+
+        Follows find_transcript: languages in order, manual before generated,
+        then any track sharing a language's base code (pt -> pt-BR).
+        """
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT language_code, generated, language FROM tracks WHERE video_id = ? "
+                "ORDER BY generated, language_code", (video_id,)).fetchall()
+            candidates = [(code, bool(generated), name) for language in languages
+                          for code, generated, name in rows if code == language]
+            candidates += [(code, bool(generated), name) for language in languages
+                           for code, generated, name in rows if code.split('-')[0] == language.split('-')[0]]
+            for language_code, generated, name in candidates:
+                segments = self._use(video_id, language_code, generated)
+                if segments is not None:
+                    self.hits += 1
+                    return segments, language_code, generated, name
+            self.misses += 1
+            return None
+
+    def _use(self, video_id: str, language_code: str, generated: bool) -> Optional[list]:
+        """Load a track and mark it recently used; the caller holds the lock."""
+        row = self.db.execute(
+            "SELECT digest FROM tracks WHERE video_id = ? AND language_code = ? AND generated = ?",
+            (video_id, language_code, int(generated))).fetchone()
+        segments = self._load(row[0]) if row else None
+        if segments is not None:
+            self.db.execute(
+                "UPDATE tracks SET last_used = ? WHERE video_id = ? AND language_code = ? AND generated = ?",
+                (time.time(), video_id, language_code, int(generated)))
+            self.db.commit()
+        return segments
+
+    def put(self, video_id: str, language_code: str, generated: bool, language: str, segments: list):
+        """Store one track's segments, then evict down to the size cap."""
+        data = encode_segments(segments)
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        now = time.time()
+        with self.lock:
+            if not path.exists():
+                path.parent.mkdir(exist_ok=True)
+                tmp = path.with_name(path.name + ".tmp")
+                tmp.write_bytes(zlib.compress(data, 6))
+                os.replace(tmp, path)
+            self.db.execute("INSERT OR REPLACE INTO blobs (digest, size) VALUES (?, ?)",
+                            (digest, path.stat().st_size))
+            self.db.execute(
+                "INSERT OR REPLACE INTO tracks VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (video_id, language_code, int(generated), language, digest, now, now))
+            self._evict()
+            self.db.commit()
+
+    def get_listing(self, video_id: str) -> Optional[List[Tuple[str, str, bool]]]:
+        """Cached track listing of a video as (language_code, language, generated) tuples."""
+        with self.lock:
+            row = self.db.execute("SELECT tracks FROM listings WHERE video_id = ?", (video_id,)).fetchone()
+        return [(code, language, bool(generated)) for code, language, generated in json.loads(row[0])] if row else None
+
+    def put_listing(self, video_id: str, tracks: List[Tuple[str, str, bool]]):
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO listings VALUES (?, ?, ?)",
+                            (video_id, json.dumps(tracks, ensure_ascii=False), time.time()))
+            self.db.commit()
+
+    def _load(self, digest: str) -> Optional[list]:
+        try:
+            return json.loads(zlib.decompress(self._blob_path(digest).read_bytes()))
+        except (OSError, zlib.error, ValueError):
+            return None
+
+    def _evict(self):
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        lru = self.db.execute(
+            "SELECT video_id, language_code, generated, digest FROM tracks ORDER BY last_used").fetchall()
+        for video_id, language_code, generated, digest in lru:
+            if total <= self.max_bytes:
+                break
+            self.db.execute("DELETE FROM tracks WHERE video_id = ? AND language_code = ? AND generated = ?",
+                            (video_id, language_code, generated))
+            still_used = self.db.execute("SELECT 1 FROM tracks WHERE digest = ? LIMIT 1", (digest,)).fetchone()
+            if still_used:
+                continue
+            size = self.db.execute("SELECT size FROM blobs WHERE digest = ?", (digest,)).fetchone()
+            self.db.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+            self._blob_path(digest).unlink(missing_ok=True)
+            total -= size[0] if size else 0
+
+    def tracks(self) -> List[Tuple[str, str, bool, str]]:
+        """Every cached track as (video_id, language_code, generated, digest)."""
+        with self.lock:
+            rows = self.db.execute("SELECT video_id, language_code, generated, digest FROM tracks").fetchall()
+        return [(video_id, code, bool(generated), digest) for video_id, code, generated, digest in rows]
+
+    def load(self, digest: str) -> Optional[list]:
+        """Segments stored under `digest`, without touching LRU order."""
+        return self._load(digest)
+
+    def stats(self) -> dict:
+        with self.lock:
+            tracks, videos = self.db.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT video_id) FROM tracks").fetchone()
+            blobs, size = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+        return {'videos': videos, 'tracks': tracks, 'blobs': blobs, 'bytes': size, 'max_bytes': self.max_bytes}
+
+    def clear(self):
+        with self.lock:
+            for (digest,) in self.db.execute("SELECT digest FROM blobs").fetchall():
+                self._blob_path(digest).unlink(missing_ok=True)
+            self.db.execute("DELETE FROM tracks")
+            self.db.execute("DELETE FROM blobs")
+            self.db.execute("DELETE FROM listings")
+            self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or clear the transcript cache")
+    parser.add_argument('--cache-dir', default=str(CACHE_DIR), help="Cache directory")
+    parser.add_argument('--clear', action='store_true', help="Delete every cached transcript")
+    args = parser.parse_args()
+
+    cache = TranscriptCache(Path(args.cache_dir))
+    if args.clear:
+        cache.clear()
+        print("Cache cleared")
+    stats = cache.stats()
+    print(f"Cache: {stats['videos']} videos, {stats['tracks']} tracks, "
+          f"{stats['bytes'] / 1024 / 1024:.1f} / {stats['max_bytes'] / 1024 / 1024:.0f} MB")
+    cache.close()
+
+
+if __name__ == '__main__':
+    main()
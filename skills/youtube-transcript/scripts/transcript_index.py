@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Full-text search over fetched YouTube transcripts.
+
+Segments are indexed in SQLite FTS5, one row per segment with its video,
+language and start time, so every hit links to the moment it is spoken.
+Each track (video, language, manual or generated) is indexed together with
+the digest of its segment list. Re-adding an unchanged transcript is a no-op, and a changed one replaces
+only its own rows.
+
+Usage:
+    python3 transcript_index.py add              # index everything in the transcript cache
+    python3 transcript_index.py search "interest rates" [--lang en] [--limit 20]
+    python3 transcript_index.py stats
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from transcript_cache import CACHE_DIR, TranscriptCache, segment_digest
+
+INDEX_PATH = Path(os.path.expanduser("~/.local/share/youtube-transcript/index.db"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    video_id TEXT NOT NULL,
+    language_code TEXT NOT NULL,
+    generated INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    indexed_at REAL NOT NULL,
+    PRIMARY KEY (video_id, language_code, generated)
+);
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY,
+    video_id TEXT NOT NULL,
+    language_code TEXT NOT NULL,
+    generated INTEGER NOT NULL,
+    start REAL NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS segments_document ON segments (video_id, language_code, generated);
+CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(
+    text, content='segments', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS segments_ai AFTER INSERT ON segments BEGIN
+    INSERT INTO segments_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS segments_ad AFTER DELETE ON segments BEGIN
+    INSERT INTO segments_fts (segments_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+# Indexes built before tracks were keyed on `generated` are rebuilt from scratch
+OLD_SCHEMA = """
+DROP TRIGGER IF EXISTS segments_ai;
+DROP TRIGGER IF EXISTS segments_ad;
+DROP TABLE IF EXISTS segments_fts;
+DROP TABLE IF EXISTS segments;
+DROP TABLE IF EXISTS documents;
+"""
+
+
+def video_link(video_id: str, start: float) -> str:
+    return f"https://youtu.be/{video_id}?t={int(start)}"
+
+
+def fts_query(query: str) -> str:
+    """Quote each word so user input is matched literally rather than parsed as FTS syntax."""
+    return ' '.join('"' + word.replace('"', '""') + '"' for word in query.split())
+
+
+class TranscriptIndex:
+    """Incremental FTS5 index of transcript segments."""
+
+    def __init__(self, path: Path = INDEX_PATH):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        columns = [row[1] for row in self.db.execute("PRAGMA table_info(documents)")]
+        if columns and 'generated' not in columns:
+            self.db.executescript(OLD_SCHEMA)
+        self.db.executescript(SCHEMA)
+
+    def _digest(self, video_id: str, language_code: str, generated: bool) -> Optional[str]:
+        row = self.db.execute(
+            "SELECT digest FROM documents WHERE video_id = ? AND language_code = ? AND generated = ?",
+            (video_id, language_code, int(generated))).fetchone()
+        return row[0] if row else None
+
+    def add(self, video_id: str, language_code: str, generated: bool, segments: list,
+            digest: Optional[str] = None) -> bool:
+        """Index one track; returns False if it was already indexed unchanged."""
+        digest = digest or segment_digest(segments)
+        key = (video_id, language_code, int(generated))
+        with self.lock:
+            if self._digest(*key) == digest:
+                return False
+            with self.db:
+                self.db.execute("DELETE FROM segments WHERE video_id = ? AND language_code = ? AND generated = ?",
+                                key)
+                self.db.executemany(
+                    "INSERT INTO segments (video_id, language_code, generated, start, text) VALUES (?, ?, ?, ?, ?)",
+                    (key + (item['start'], item['text']) for item in segments))
+                self.db.execute("INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?)",
+                                key + (digest, time.time()))
+            return True
+
+    def add_transcript(self, video_id: str, transcript) -> int:
+        """
+        Index a fetch_transcript result: one segment list, or a multi-language dict.
+
+        Segments are TrackSegments, so each is filed under the track actually
+        fetched rather than the language that was asked for.
+        """
+        tracks = [data['segments'] for data in transcript.values()] if isinstance(transcript, dict) else [transcript]
+        return sum(self.add(video_id, segments.language_code, segments.generated, segments)
+                   for segments in tracks)
+
+    def add_cache(self, cache: TranscriptCache) -> int:
+        """Index every track in the transcript cache not yet indexed in its current version."""
+        added = 0
+        for video_id, language_code, generated, digest in cache.tracks():
+            with self.lock:
+                indexed = self._digest(video_id, language_code, generated)
+            if indexed == digest:
+                continue
+            segments = cache.load(digest)
+            if segments is not None:
+                added += self.add(video_id, language_code, generated, segments, digest)
+        return added
+
+    def search(self, query: str, language: Optional[str] = None, video_id: Optional[str] = None,
+               limit: int = 20, raw: bool = False) -> List[dict]:
+        """Best-matching segments by BM25, with a highlighted snippet and a deep link."""
+        sql = """
+            SELECT s.video_id, s.language_code, s.generated, s.start, snippet(segments_fts, 0, '[', ']', '…', 16),
+                   bm25(segments_fts)
+            FROM segments_fts JOIN segments s ON s.id = segments_fts.rowid
+            WHERE segments_fts MATCH ?"""
+        params = [query if raw else fts_query(query)]
+        if language:
+            sql += " AND s.language_code = ?"
+            params.append(language)
+        if video_id:
+            sql += " AND s.video_id = ?"
+            params.append(video_id)
+        sql += " ORDER BY bm25(segments_fts) LIMIT ?"
+        params.append(limit)
+        with self.lock:
+            rows = self.db.execute(sql, params).fetchall()
+        return [{'video_id': vid, 'language_code': code, 'generated': bool(generated), 'start': start,
+                 'snippet': snippet, 'score': -rank, 'link': video_link(vid, start)}
+                for vid, code, generated, start, snippet, rank in rows]
+
+    def stats(self) -> dict:
+        with self.lock:
+            documents, videos = self.db.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT video_id) FROM documents").fetchone()
+            segments = self.db.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+        return {'videos': videos, 'documents': documents, 'segments': segments}
+
+    def close(self):
+        self.db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search fetched YouTube transcripts")
+    parser.add_argument('--index', default=str(INDEX_PATH), help="Index database path")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    add = sub.add_parser('add', help="Index new or changed transcripts from the transcript cache")
+    add.add_argument('--cache-dir', default=str(CACHE_DIR), help="Transcript cache directory")
+
+    search = sub.add_parser('search', help="Ranked segment hits with youtu.be deep links")
+    search.add_argument('query', help="Words to search for")
+    search.add_argument('--lang', '-l', help="Only this language code")
+    search.add_argument('--video', help="Only this video ID")
+    search.add_argument('--limit', '-n', type=int, default=20, help="Maximum hits")
+    search.add_argument('--raw', action='store_true', help="Pass the query as FTS5 syntax (AND/OR/NEAR, prefix*)")
+
+    sub.add_parser('stats', help="Show index size")
+    args = parser.parse_args()
+
+    index = TranscriptIndex(Path(args.index))
+    try:
+        if args.command == 'add':
+            cache = TranscriptCache(Path(args.cache_dir))
+            added = index.add_cache(cache)
+            cache.close()
+            print(f"Indexed {added} new or changed transcripts")
+        elif args.command == 'search':
+            try:
+                hits = index.search(args.query, args.lang, args.video, args.limit, args.raw)
+            except sqlite3.OperationalError as e:
+                print(f"Error: invalid query: {e}")
+                return 1
+            if not hits:
+                print("No matches")
+            for hit in hits:
+                track = hit['language_code'] + (', auto' if hit['generated'] else '')
+                print(f"{hit['link']:<42} [{track}] {hit['snippet']}")
+            return 0
+        stats = index.stats()
+        print(f"Index: {stats['videos']} videos, {stats['documents']} transcripts, {stats['segments']} segments")
+    finally:
+        index.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
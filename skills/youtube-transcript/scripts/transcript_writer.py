@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Streaming transcript writer.
+
+Writes one segment list to any number of output formats in a single pass.
+Each segment is formatted straight into every open stream, so no output is
+built up in memory, however long the transcript.
+"""
+
+import json
+from typing import Dict, Iterable, TextIO
+
+FORMATS = ('text', 'json', 'ndjson', 'srt', 'vtt')
+EXTENSIONS = {'text': '.txt', 'json': '.json', 'ndjson': '.ndjson', 'srt': '.srt', 'vtt': '.vtt'}
+
+# Built once: json.dumps with non-default options makes a new encoder per call
+_encode = json.JSONEncoder(ensure_ascii=False).encode
+
+
+def split_timestamp(seconds: float) -> tuple:
+    """('HH:MM:SS', 'mmm') from integer arithmetic on rounded milliseconds."""
+    millis = int(seconds * 1000 + 0.5)
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return '%02d:%02d:%02d' % (hours, minutes, secs), '%03d' % millis
+
+
+def format_timestamp(seconds: float, separator: str = '.') -> str:
+    """HH:MM:SS.mmm, or HH:MM:SS,mmm for SRT with separator=','."""
+    clock, millis = split_timestamp(seconds)
+    return clock + separator + millis
+
+
+def json_entry(item: dict) -> str:
+    """One (flat) segment as it appears inside json.dumps(segments, indent=2)."""
+    return '{' + ','.join(f'\n    {_encode(key)}: {_encode(value)}' for key, value in item.items()) + '\n  }'
+
+
+def write_transcript(segments: Iterable[dict], streams: Dict[str, TextIO]):
+    """Write `segments` to each {format: stream} in one pass over the segments."""
+    text = streams.get('text')
+    as_json = streams.get('json')
+    ndjson = streams.get('ndjson')
+    srt = streams.get('srt')
+    vtt = streams.get('vtt')
+
+    if vtt:
+        vtt.write("WEBVTT\n")
+    if as_json:
+        as_json.write("[")
+
+    count = 0
+    for item in segments:
+        count += 1
+        if text:
+            if count > 1:
+                text.write(' ')
+            text.write(item['text'])
+        if as_json:
+            as_json.write(('\n  ' if count == 1 else ',\n  ') + json_entry(item))
+        if ndjson:
+            ndjson.write(_encode(item) + '\n')
+        if srt or vtt:
+            start, start_ms = split_timestamp(item['start'])
+            end, end_ms = split_timestamp(item['start'] + item['duration'])
+            if srt:
+                if count > 1:
+                    srt.write('\n')
+                srt.write(f"{count}\n{start},{start_ms} --> {end},{end_ms}\n{item['text']}\n")
+            if vtt:
+                vtt.write(f"\n{start}.{start_ms} --> {end}.{end_ms}\n{item['text']}\n")
+
+    if as_json:
+        as_json.write("\n]" if count else "]")